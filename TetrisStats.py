@@ -3,17 +3,37 @@ import os
 import json
 import colorsys
 import multiprocessing
+import argparse
+import csv
+import hashlib
+import threading
+import queue
+import bisect
+import shutil
+import re
+import difflib
+from collections import OrderedDict
 from functools import partial
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QListWidget, QPushButton, QLabel, QComboBox, QFileDialog, 
                              QHeaderView, QSplitter, QGridLayout, QFrame, QTableWidget, QTableWidgetItem,
                              QAbstractItemView, QTabWidget, QLineEdit, QScrollArea, QDialog, QFormLayout, QDoubleSpinBox,
-                             QProgressBar, QMessageBox,QProgressDialog)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QPainter, QColor, QPen, QFont
+                             QProgressBar, QMessageBox,QProgressDialog, QSlider)
+from PyQt5.QtCore import Qt, QRect, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPen, QFont, QImage
 import numpy as np
 import concurrent.futures
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 # Define the ranges for each statistic
 STAT_RANGES = {
     'PPS': (0, 4),
@@ -26,6 +46,22 @@ STAT_RANGES = {
     'Damage Potential': (0, 8)
 }
 
+# Bump whenever process_file changes what it stores so stale cache entries and failures are redone
+PARSER_VERSION = 3
+
+# Bump whenever the calculate_* formulas change so the derived stats are recomputed
+FORMULA_VERSION = 1
+
+DEFAULT_CACHE_DIR = "replay_cache"
+
+# The axes of the radar chart, also used as the player similarity space
+RADAR_STATS = ['PPS', 'APM', 'VS Score', 'APP', 'DS/Piece', 'DS/Second', 'Garbage Efficiency']
+
+TREND_GRANULARITIES = {'Daily': 'day', 'Weekly': 'week'}
+
+# Round 0 holds a player's averages over all rounds of the replay
+EXPORT_COLUMNS = ['replay', 'round', 'username', 'won'] + list(STAT_RANGES)
+
 def generate_distinct_colors(n):
     colors = []
     for i in range(n):
@@ -64,6 +100,30 @@ def calculate_ds_per_second(vs, apm):
 def calculate_damage_potential(pps, app, ge):
     return pps * (1 + app) * (1 + ge)
 
+def safe_divide(numerator, denominator, mask):
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=mask)
+
+def calculate_derived_stats_grid(pps, apm, vs):
+    # The calculate_* formulas above, evaluated over whole arrays at once
+    pps, apm, vs = np.broadcast_arrays(np.asarray(pps, dtype=float), np.asarray(apm, dtype=float), np.asarray(vs, dtype=float))
+    valid = (pps > 0) & (apm > 0)
+    app = safe_divide(apm, pps * 60, valid)
+    ds_per_second = (vs / 100) - (apm / 60)
+    ds_per_piece = safe_divide(ds_per_second, pps, valid)
+    garbage_efficiency = safe_divide(app * ds_per_piece, pps, (pps > 0) & (app > 0)) * 2
+    damage_potential = pps * (1 + app) * (1 + garbage_efficiency)
+    return {
+        'PPS': pps,
+        'APM': apm,
+        'VS Score': vs,
+        'APP': app,
+        'DS/Piece': ds_per_piece,
+        'DS/Second': ds_per_second,
+        'Garbage Efficiency': garbage_efficiency,
+        'Damage Potential': damage_potential,
+        'VS/APM': safe_divide(vs, apm, apm > 0)
+    }
+
 class PlayerProfile:
     def __init__(self, username):
         self.username = username
@@ -107,95 +167,1465 @@ class PlayerProfile:
                            'total_games': wins['wins'] + wins['losses']}
                 for opponent, wins in self.matchups.items()}
 
-def process_file(file_path, cache_dir):
+# Play style category thresholds, a value below the first threshold is "Low"
+PLAY_STYLE_CATEGORIES = ["Low", "Below Average", "Average", "Above Average", "High", "Extremely High", "God-Tier"]
+APP_THRESHOLDS = [0.3, 0.45, 0.6, 0.75, 0.9]
+GE_THRESHOLDS = [0.05, 0.10, 0.15, 0.20, 0.30]
+VS_APM_THRESHOLDS = [1.6, 1.9, 2.0, 2.2, 2.5]
+PPS_THRESHOLDS = [1.0, 2.0, 2.5, 3.0, 4]
+
+def categorize(value, thresholds):
+    for i, threshold in enumerate(thresholds):
+        if value < threshold:
+            return PLAY_STYLE_CATEGORIES[i]
+    return PLAY_STYLE_CATEGORIES[-1]
+
+def category_indices(values, thresholds):
+    # Vectorized categorize: values at or above every threshold land on the last category
+    indices = np.searchsorted(thresholds, values, side='right')
+    return np.where(indices == len(thresholds), len(PLAY_STYLE_CATEGORIES) - 1, indices)
+
+# Category axes of the play style, as (stat, thresholds)
+PLAY_STYLE_AXES = {
+    'Speed Category': ('PPS', PPS_THRESHOLDS),
+    'APP Category': ('APP', APP_THRESHOLDS),
+    'Garbage Efficiency Category': ('Garbage Efficiency', GE_THRESHOLDS),
+    'VS/APM Category': ('VS/APM', VS_APM_THRESHOLDS)
+}
+
+WHAT_IF_RANGES = {'PPS': (0, 4.5), 'APM': (0, 350), 'VS Score': (0, 500)}
+
+# One PPS x APM x VS grid per resolution, computed the first time it is asked for
+WHAT_IF_GRIDS = {}
+
+def what_if_grid(resolution=64):
+    if resolution not in WHAT_IF_GRIDS:
+        axes = {stat: np.linspace(low, high, resolution) for stat, (low, high) in WHAT_IF_RANGES.items()}
+        pps, apm, vs = np.meshgrid(axes['PPS'], axes['APM'], axes['VS Score'], indexing='ij')
+        grid = calculate_derived_stats_grid(pps, apm, vs)
+        for name, (stat, thresholds) in PLAY_STYLE_AXES.items():
+            grid[name] = category_indices(grid[stat], thresholds)
+        WHAT_IF_GRIDS[resolution] = (axes, grid)
+    return WHAT_IF_GRIDS[resolution]
+
+def play_style_stats(averages):
+    # APP and Garbage Efficiency are averaged per game, not recomputed from the averaged PPS and APM
+    return {
+        'PPS': averages['PPS'],
+        'APP': averages['APP'],
+        'Garbage Efficiency': averages['Garbage Efficiency'],
+        'VS/APM': averages['VS Score'] / averages['APM'] if averages['APM'] > 0 else 0
+    }
+
+def threshold_distances(stats):
+    distances = []
+    for name, (stat, thresholds) in PLAY_STYLE_AXES.items():
+        value = float(stats[stat])
+        category = categorize(value, thresholds)
+        next_thresholds = [threshold for threshold in thresholds if threshold > value]
+        next_threshold = next_thresholds[0] if next_thresholds else None
+        distances.append((name, stat, value, category, next_threshold))
+    return distances
+
+def analyze_play_style(player_profile):
+    stats = play_style_stats(player_profile.get_averages())
+    app = stats['APP']
+    vs_apm_ratio = stats['VS/APM']
+    ge = stats['Garbage Efficiency']
+    pps = stats['PPS']
+
+    app_category = categorize(app, APP_THRESHOLDS)
+    ge_category = categorize(ge, GE_THRESHOLDS)
+    vs_apm_category = categorize(vs_apm_ratio, VS_APM_THRESHOLDS)
+    pps_category = categorize(pps, PPS_THRESHOLDS)
+
+    speed_descriptors = {
+        "Low": "Very low-speed",
+        "Below Average": "Low-speed",
+        "Average": "Medium-speed",
+        "Above Average": "High-speed",
+        "High": "Very high-speed",
+        "Extremely High": "Extremely high-speed",
+        "God-Tier": "God Tier-speed"
+    }
+    speed_descriptor = speed_descriptors[pps_category]
+
+    if app_category in ["God-Tier", "Extremely High"]:
+        attack_style = "Highly efficient attacker"
+    elif app_category in ["High", "Above Average"]:
+        attack_style = "Efficient attacker"
+    elif app_category == "Average":
+        attack_style = "Balanced attacker"
+    else:
+        attack_style = "Inefficient attacker"
+
+    if vs_apm_category in ["Low", "Below Average"]:
+        if pps_category in ["High", "Extremely High", "God-Tier"]:
+            aggressiveness = "Highly offensive"
+        elif pps_category in ["Above Average", "Average"]:
+            aggressiveness = "Offensive"
+        else:
+            aggressiveness = "Low-pressure player"
+    elif vs_apm_category in ["Average", "Above Average"]:
+        aggressiveness = "Balanced"
+    else:
+        if ge_category in ["High", "Extremely High", "God-Tier"]:
+            aggressiveness = "Defensive specialist"
+        elif ge_category in ["Above Average", "Average"]:
+            aggressiveness = "Pressure-resistant"
+        else:
+            aggressiveness = "Defensive struggler"
+
+    if vs_apm_category in ["God-Tier", "Extremely High", "High"]:
+        if ge_category in ["God-Tier", "Extremely High", "High"]:
+            garbage_style = "Exceptional garbage handler under extreme pressure"
+        elif ge_category in ["Above Average", "Average"]:
+            garbage_style = "Competent garbage handler under high pressure"
+        else:
+            garbage_style = "Struggles with efficiency under high pressure"
+    elif vs_apm_category in ["Above Average", "Average"]:
+        if ge_category in ["God-Tier", "Extremely High", "High"]:
+            garbage_style = "Highly efficient garbage handler under moderate pressure"
+        elif ge_category in ["Above Average", "Average"]:
+            garbage_style = "Balanced garbage handling under moderate pressure"
+        else:
+            garbage_style = "Inefficient garbage handler under moderate pressure"
+    else:
+        if ge_category in ["God-Tier", "Extremely High", "High"]:
+            garbage_style = "Highly efficient garbage handler with low incoming pressure"
+        elif ge_category in ["Above Average", "Average"]:
+            garbage_style = "Competent garbage handler with low incoming pressure"
+        else:
+            garbage_style = "Inefficient garbage handling, even under low pressure"
+
+    playstyle = f"{speed_descriptor}, {aggressiveness} player with {attack_style.lower()} capabilities. {garbage_style}."
+
+    if vs_apm_category in ["God-Tier", "Extremely High", "High"] and app_category in ["God-Tier", "Extremely High", "High"]:
+        playstyle += " Excels in high-pressure situations with efficient counterattacks."
+    elif vs_apm_category in ["Low", "Below Average"] and pps_category in ["High", "Extremely High", "God-Tier"]:
+        playstyle += " Dominates through relentless offensive pressure."
+    elif vs_apm_category in ["God-Tier", "Extremely High", "High"] and ge_category in ["God-Tier", "Extremely High", "High"]:
+        playstyle += " Thrives on efficient downstacking under extreme pressure."
+    elif vs_apm_category in ["Low", "Below Average"] and app_category in ["High", "Extremely High", "God-Tier"]:
+        playstyle += " Efficiently converts opportunities into strong attacks."
+
+    return playstyle
+
+def get_improvement_suggestions(player_profile):
+    stats = play_style_stats(player_profile.get_averages())
+    app = stats['APP']
+    vs_apm_ratio = stats['VS/APM']
+    ge = stats['Garbage Efficiency']
+    pps = stats['PPS']
+
+    app_category = categorize(app, APP_THRESHOLDS)
+    ge_category = categorize(ge, GE_THRESHOLDS)
+    vs_apm_category = categorize(vs_apm_ratio, VS_APM_THRESHOLDS)
+    pps_category = categorize(pps, PPS_THRESHOLDS)
+
+    suggestions = []
+
+    if pps_category == "God-Tier":
+        suggestions.append("Your speed is phenomenal. Focus on maintaining this level while optimizing efficiency, attack power, and consistency under varying pressure situations.")
+    elif pps_category in ["Extremely High", "High"]:
+        suggestions.append("Your speed is excellent. Work on consistency and efficiency at these high speeds.")
+    elif pps_category in ["Above Average", "Average"]:
+        suggestions.append("Your speed is good. Continue to improve by practicing finesse and efficient piece placement.")
+    else:
+        suggestions.append("Focus on increasing your overall speed (PPS). Practice finesse and efficient piece placement.")
+
+    if ge_category == "God-Tier":
+        suggestions.append("Your garbage efficiency is outstanding. Maintain this level while optimizing other aspects of your game.")
+    elif ge_category in ["Extremely High", "High"]:
+        suggestions.append("Your garbage efficiency is very good. Fine-tune your downstacking for even better performance under pressure.")
+    elif ge_category in ["Above Average", "Average"]:
+        suggestions.append("Your garbage efficiency is decent. Practice more efficient downstacking techniques to improve further.")
+    else:
+        suggestions.append("Work on improving your garbage efficiency. Focus on cleaner downstacking and better piece placement.")
+
+    if app_category == "God-Tier":
+        suggestions.append("Your attack efficiency is incredible. Focus on maintaining this level while adapting to different board states and opponent playstyles.")
+    elif app_category in ["Extremely High", "High"]:
+        suggestions.append("Your attack efficiency is very good. Work on consistency and adapting to different situations.")
+    elif app_category in ["Above Average", "Average"]:
+        suggestions.append("Your attack efficiency is solid. Practice more advanced attack techniques to increase your APP.")
+    else:
+        suggestions.append("Improve your attack efficiency (APP). Practice building cleaner and executing attacks faster.")
+
+    if vs_apm_category in ["High", "Extremely High", "God-Tier"] and app_category in ["High", "Extremely High", "God-Tier"]:
+        suggestions.append("You're effectively attacking while handling high pressure. Focus on maintaining this balance and look for opportunities to overwhelm opponents.")
+    elif vs_apm_category in ["High", "Extremely High", "God-Tier"] and app_category in ["Low", "Below Average", "Average"]:
+        suggestions.append("You're handling high pressure but could improve your attack efficiency. Work on building and executing attacks more effectively under pressure.")
+    elif vs_apm_category in ["Low", "Below Average", "Average"] and app_category in ["High", "Extremely High", "God-Tier"]:
+        suggestions.append("Your attacks are highly efficient, but you're not under much pressure. Practice maintaining this efficiency against stronger opponents or in faster-paced games.")
+    elif vs_apm_category in ["Low", "Below Average", "Average"] and app_category in ["Low", "Below Average", "Average"]:
+        suggestions.append("You're not under much pressure, but your attacks could be more efficient. Focus on improving your offensive capabilities to control the game better.")
+
+    if vs_apm_category in ["High", "Extremely High", "God-Tier"] and ge_category in ["High", "Extremely High", "God-Tier"]:
+        suggestions.append("You're excellently managing high amounts of garbage. Work on offensive strategies to reduce incoming attacks while maintaining this efficiency.")
+    elif vs_apm_category in ["High", "Extremely High", "God-Tier"] and ge_category in ["Low", "Below Average", "Average"]:
+        suggestions.append("You're under high pressure and could improve your garbage management. Focus on more efficient downstacking techniques.")
+    elif vs_apm_category in ["Low", "Below Average", "Average"] and ge_category in ["High", "Extremely High", "God-Tier"]:
+        suggestions.append("Your garbage efficiency is high, but you're not under much pressure. Prepare for handling higher pressure situations while maintaining this efficiency.")
+    elif vs_apm_category in ["Low", "Below Average", "Average"] and ge_category in ["Low", "Below Average", "Average"]:
+        suggestions.append("You're not under much pressure, but could improve garbage efficiency. Work on downstacking techniques to prepare for higher-pressure games.")
+
+    if pps_category in ["High", "Extremely High", "God-Tier"] and app_category in ["Low", "Below Average"]:
+        suggestions.append("Your speed is excellent, but your attack efficiency could improve. Focus on converting your quick placements into more effective attacks.")
+    elif app_category in ["High", "Extremely High", "God-Tier"] and pps_category in ["Low", "Below Average"]:
+        suggestions.append("Your attack efficiency is high, but overall speed is low. Work on increasing PPS while maintaining strong attack patterns.")
+
+    return suggestions[:5]
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def cache_paths(file_path, cache_dir):
+    base = os.path.join(cache_dir, os.path.basename(file_path))
+    return f"{base}.cache", f"{base}.failed"
+
+def record_failure(file_path, cache_dir, error):
+    _, failure_file = cache_paths(file_path, cache_dir)
+    failure = {
+        'file': os.path.basename(file_path),
+        'path': file_path,
+        'fingerprint': file_fingerprint(file_path),
+        'error': type(error).__name__,
+        'message': str(error),
+        'parser_version': PARSER_VERSION
+    }
+    with open(failure_file, 'w') as f:
+        json.dump(failure, f)
+
+def load_failure(file_path, cache_dir):
+    _, failure_file = cache_paths(file_path, cache_dir)
+    if not os.path.exists(failure_file):
+        return None
+    try:
+        with open(failure_file, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+def list_quarantined(cache_dir):
+    failures = []
+    if not os.path.isdir(cache_dir):
+        return failures
+    for file_name in sorted(os.listdir(cache_dir)):
+        if file_name.endswith('.failed'):
+            try:
+                with open(os.path.join(cache_dir, file_name), 'r') as f:
+                    failures.append(json.load(f))
+            except ValueError:
+                continue
+    return failures
+
+def clear_quarantine(cache_dir, file_names=None):
+    for failure in list_quarantined(cache_dir):
+        if file_names is None or failure['file'] in file_names:
+            _, failure_file = cache_paths(failure['file'], cache_dir)
+            if os.path.exists(failure_file):
+                os.remove(failure_file)
+
+def parse_replay(data):
+    round_stats = []
+    overall_stats = {}
+    winner = None
+
+    if 'replay' in data:
+        # Determine the winner
+        if 'leaderboard' in data['replay']:
+            leaderboard = data['replay']['leaderboard']
+            winner = max(leaderboard, key=lambda x: x['wins'])['username']
+
+        if 'rounds' in data['replay']:
+            for round_index, round_data in enumerate(data['replay']['rounds'], 1):
+                round_stats.append({})
+                for player_data in round_data:
+                    stats = player_data['stats']
+                    username = player_data['username']
+                    pps = stats['pps']
+                    apm = stats['apm']
+                    vs = stats['vsscore']
+                    app = calculate_app(apm, pps)
+                    ds_per_piece = calculate_ds_per_piece(vs, apm, pps)
+                    ds_per_second = calculate_ds_per_second(vs, apm)
+                    garbage_efficiency = calculate_garbage_efficiency(pps, ds_per_piece, app)
+                    damage_potential = calculate_damage_potential(pps, app, garbage_efficiency)
+
+                    round_stats[-1][username] = {
+                        'PPS': pps,
+                        'APM': apm,
+                        'VS Score': vs,
+                        'APP': app,
+                        'DS/Piece': ds_per_piece,
+                        'DS/Second': ds_per_second,
+                        'Garbage Efficiency': garbage_efficiency,
+                        'Damage Potential': damage_potential
+                    }
+
+                    if username not in overall_stats:
+                        overall_stats[username] = {stat: [] for stat in round_stats[-1][username]}
+
+                    for stat, value in round_stats[-1][username].items():
+                        overall_stats[username][stat].append(value)
+
+    else:
+        raise ValueError("Unknown replay format")
+
+    for username in overall_stats:
+        for stat in overall_stats[username]:
+            overall_stats[username][stat] = sum(overall_stats[username][stat]) / len(overall_stats[username][stat])
+
+    return round_stats, overall_stats, winner
+
+# Extra per-round metrics, computed in one shared pass over each round's event stream.
+# Each metric carries its own version, so adding or changing one only computes that metric again.
+METRIC_REDUCERS = {}
+
+def register_metric(reducer_class):
+    METRIC_REDUCERS[reducer_class.name] = reducer_class
+    return reducer_class
+
+def event_data(event):
+    data = event.get('data')
+    return data if isinstance(data, dict) else {}
+
+class MetricReducer:
+    name = None
+    version = 1
+
+    def feed(self, event):
+        pass
+
+    def finish(self, stats):
+        return None
+
+class EndStatsReducer(MetricReducer):
+    def __init__(self):
+        self.export = None
+
+    def feed(self, event):
+        if event.get('type') == 'end':
+            self.export = event_data(event).get('export', {}).get('stats')
+
+    def finish(self, stats):
+        return self.value(self.export) if self.export else None
+
+    def value(self, export):
+        return None
+
+@register_metric
+class KeysPerPieceReducer(MetricReducer):
+    name = 'KPP'
+
+    def __init__(self):
+        self.keys = 0
+        self.pieces = 0
+
+    def feed(self, event):
+        if event.get('type') == 'keydown' and not event_data(event).get('hoisted'):
+            self.keys += 1
+            if event_data(event).get('key') == 'hardDrop':
+                self.pieces += 1
+
+    def finish(self, stats):
+        return self.keys / self.pieces if self.pieces else None
+
+@register_metric
+class SpinsReducer(EndStatsReducer):
+    name = 'Spins'
+
+    def value(self, export):
+        return sum(count for clear, count in export.get('clears', {}).items() if 'tspin' in clear)
+
+@register_metric
+class TopComboReducer(EndStatsReducer):
+    name = 'Top Combo'
+
+    def value(self, export):
+        return export.get('topcombo')
+
+@register_metric
+class FinesseFaultsReducer(EndStatsReducer):
+    name = 'Finesse Faults'
+
+    def value(self, export):
+        return export.get('finesse', {}).get('faults')
+
+@register_metric
+class AttackPerLineReducer(EndStatsReducer):
+    name = 'Attack/Line'
+
+    def value(self, export):
+        lines = export.get('lines')
+        return export.get('garbage', {}).get('sent', 0) / lines if lines else None
+
+def round_events(player_data):
+    return player_data.get('replay', {}).get('events') or player_data.get('events') or []
+
+def stale_metrics(entry):
+    metrics = entry.get('metrics', {})
+    return [name for name, reducer_class in METRIC_REDUCERS.items()
+            if metrics.get(name, {}).get('version') != reducer_class.version]
+
+def compute_metrics(data, names):
+    reducer_classes = [METRIC_REDUCERS[name] for name in names]
+    rounds = {name: [] for name in names}
+    # A failing reducer only loses its own metric, the replay and the other metrics are kept
+    errors = {}
+    for round_data in data.get('replay', {}).get('rounds', []):
+        for name in names:
+            rounds[name].append({})
+        for player_data in round_data:
+            reducers = [reducer_class() for reducer_class in reducer_classes if reducer_class.name not in errors]
+            for event in round_events(player_data):
+                for reducer in reducers:
+                    if reducer.name in errors:
+                        continue
+                    try:
+                        reducer.feed(event)
+                    except Exception as e:
+                        errors[reducer.name] = f"{type(e).__name__}: {e}"
+            for reducer in reducers:
+                if reducer.name in errors:
+                    continue
+                try:
+                    rounds[reducer.name][-1][player_data['username']] = reducer.finish(player_data.get('stats', {}))
+                except Exception as e:
+                    errors[reducer.name] = f"{type(e).__name__}: {e}"
+
+    metrics = {}
+    for name in names:
+        if name in errors:
+            # Kept with its version so the replay is not retried until the reducer changes
+            metrics[name] = {'version': METRIC_REDUCERS[name].version, 'error': errors[name], 'rounds': [], 'overall': {}}
+            continue
+        values = {}
+        for players in rounds[name]:
+            for username, value in players.items():
+                if value is not None:
+                    values.setdefault(username, []).append(value)
+        metrics[name] = {
+            'version': METRIC_REDUCERS[name].version,
+            'rounds': rounds[name],
+            'overall': {username: sum(player_values) / len(player_values) for username, player_values in values.items()}
+        }
+    return metrics
+
+def is_current(entry):
+    return entry.get('parser_version') == PARSER_VERSION and entry.get('formula_version') == FORMULA_VERSION
+
+def load_cached_entry(cache_file, fingerprint):
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'r') as f:
+            cached_data = json.load(f)
+    except ValueError:
+        return None
+    # Legacy or stale cache entries are reprocessed
+    if isinstance(cached_data, dict) and is_current(cached_data) and cached_data.get('fingerprint') == fingerprint:
+        return cached_data
+    return None
+
+def load_content_entry(content_file):
+    if not os.path.exists(content_file):
+        return None
+    try:
+        with open(content_file, 'r') as f:
+            content_entry = json.load(f)
+    except ValueError:
+        return None
+    return content_entry if is_current(content_entry) else None
+
+def process_replay(file_path, cache_dir, raw=None):
     try:
         os.makedirs(cache_dir, exist_ok=True)
-        cache_file = os.path.join(cache_dir, f"{os.path.basename(file_path)}.cache")
-        
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f:
-                cached_data = json.load(f)
-                if len(cached_data) == 3:  # Check if the cached data has winner information
-                    return cached_data
-                # If not, we'll reprocess the file
-        
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-
-        round_stats = []
-        overall_stats = {}
-        winner = None
-
-        if 'replay' in data:
-            # Determine the winner
-            if 'leaderboard' in data['replay']:
-                leaderboard = data['replay']['leaderboard']
-                winner = max(leaderboard, key=lambda x: x['wins'])['username']
-
-            if 'rounds' in data['replay']:
-                for round_index, round_data in enumerate(data['replay']['rounds'], 1):
-                    round_stats.append({})
-                    for player_data in round_data:
-                        stats = player_data['stats']
-                        username = player_data['username']
-                        pps = stats['pps']
-                        apm = stats['apm']
-                        vs = stats['vsscore']
-                        app = calculate_app(apm, pps)
-                        ds_per_piece = calculate_ds_per_piece(vs, apm, pps)
-                        ds_per_second = calculate_ds_per_second(vs, apm)
-                        garbage_efficiency = calculate_garbage_efficiency(pps, ds_per_piece, app)
-                        damage_potential = calculate_damage_potential(pps, app, garbage_efficiency)
-
-                        round_stats[-1][username] = {
-                            'PPS': pps,
-                            'APM': apm,
-                            'VS Score': vs,
-                            'APP': app,
-                            'DS/Piece': ds_per_piece,
-                            'DS/Second': ds_per_second,
-                            'Garbage Efficiency': garbage_efficiency,
-                            'Damage Potential': damage_potential
-                        }
-
-                        if username not in overall_stats:
-                            overall_stats[username] = {stat: [] for stat in round_stats[-1][username]}
-
-                        for stat, value in round_stats[-1][username].items():
-                            overall_stats[username][stat].append(value)
+        cache_file, failure_file = cache_paths(file_path, cache_dir)
+        fingerprint = file_fingerprint(file_path)
+
+        failure = load_failure(file_path, cache_dir)
+        if failure is not None:
+            # Known-bad files are skipped until they change or the parser is upgraded
+            if failure['fingerprint'] == fingerprint and failure['parser_version'] == PARSER_VERSION:
+                return None
+            os.remove(failure_file)
+
+        cached_data = load_cached_entry(cache_file, fingerprint)
+        if cached_data is not None and not stale_metrics(cached_data):
+            return cached_data
+        # With only the metrics out of date, the stats come back from the content store below
+
+        if raw is None:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+
+        # Copies of the same replay share one parse through the content-addressed store
+        content_hash = hashlib.sha1(raw).hexdigest()
+        content_dir = os.path.join(cache_dir, "content")
+        content_file = os.path.join(content_dir, f"{content_hash}.json")
+        content_entry = load_content_entry(content_file)
+        data = None
+        changed = content_entry is None
+        if content_entry is None:
+            data = json.loads(raw)
+            content_entry = {
+                'parser_version': PARSER_VERSION,
+                'formula_version': FORMULA_VERSION,
+                'replay_id': data.get('_id') or data.get('id') or content_hash,
+                'timestamp': data.get('ts'),
+                'result': parse_replay(data),
+                'metrics': {}
+            }
 
-        else:
-            raise ValueError("Unknown replay format")
+        stale = stale_metrics(content_entry)
+        if stale:
+            if data is None:
+                data = json.loads(raw)
+            content_entry.setdefault('metrics', {}).update(compute_metrics(data, stale))
+            changed = True
 
-        for username in overall_stats:
-            for stat in overall_stats[username]:
-                overall_stats[username][stat] = sum(overall_stats[username][stat]) / len(overall_stats[username][stat])
+        if changed:
+            os.makedirs(content_dir, exist_ok=True)
+            with open(content_file, 'w') as f:
+                json.dump(content_entry, f)
 
-        result = (round_stats, overall_stats, winner)
-        
+        entry = dict(content_entry, fingerprint=fingerprint, content_hash=content_hash)
         with open(cache_file, 'w') as f:
-            json.dump(result, f)
-        
-        return result
+            json.dump(entry, f)
+
+        return entry
     except Exception as e:
         print(f"Error processing file {file_path}: {str(e)}")
+        if not isinstance(e, OSError):
+            try:
+                record_failure(file_path, cache_dir, e)
+            except OSError:
+                pass
+        return None
+
+def process_file(file_path, cache_dir, raw=None):
+    entry = process_replay(file_path, cache_dir, raw)
+    if entry is None:
         return [], {}, None  # Return empty data and None for winner in case of error
+    return entry['result']
 
-def batch_process_files(file_paths, cache_dir, batch_size=10):
+def needs_parse(file_path, cache_dir):
+    # Same checks process_replay makes before it reads the replay itself
+    try:
+        fingerprint = file_fingerprint(file_path)
+    except OSError:
+        return False
+    try:
+        failure = load_failure(file_path, cache_dir)
+        if failure is not None:
+            return failure['fingerprint'] != fingerprint or failure['parser_version'] != PARSER_VERSION
+        cache_file, _ = cache_paths(file_path, cache_dir)
+        cached_data = load_cached_entry(cache_file, fingerprint)
+    except OSError:
+        # Unreadable cache files are left to process_replay's own error handling
+        return True
+    return cached_data is None or bool(stale_metrics(cached_data))
+
+def stream_process_files(file_paths, cache_dir, max_workers=None, max_in_flight=None):
     os.makedirs(cache_dir, exist_ok=True)
-    
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        process_func = partial(process_file, cache_dir=cache_dir)
-        for i in range(0, len(file_paths), batch_size):
-            batch = file_paths[i:i+batch_size]
-            yield list(executor.map(process_func, batch))
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    # The reader prefetches at most max_in_flight files ahead of the parse stage
+    prefetched = queue.Queue(maxsize=max_in_flight)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                prefetched.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for file_path in file_paths:
+                raw = None
+                # Current cache entries are cheap for the workers, only files that get parsed are worth reading ahead
+                if needs_parse(file_path, cache_dir):
+                    try:
+                        with open(file_path, 'rb') as f:
+                            raw = f.read()
+                    except OSError:
+                        raw = None
+                if not put((file_path, raw)):
+                    return
+        except Exception as e:
+            # Handed to the consumer so a broken reader fails the stream instead of hanging it
+            put(e)
+            return
+        put(None)
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+    try:
+        pending = {}
+        reading = True
+        while reading or pending:
+            while reading and len(pending) < max_in_flight:
+                try:
+                    item = prefetched.get(block=not pending)
+                except queue.Empty:
+                    break
+                if item is None:
+                    reading = False
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                file_path, raw = item
+                pending[executor.submit(process_replay, file_path, cache_dir, raw)] = file_path
+
+            done, _ = concurrent.futures.wait(pending, timeout=0.05, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def rebuild_library(folder, cache_dir, max_workers=None, on_progress=None, should_stop=None, checkpoint_every=1000):
+    # process_replay only reparses entries whose parser or formula version is stale, the checkpoint
+    # lets an interrupted rebuild skip the files it already confirmed
+    os.makedirs(cache_dir, exist_ok=True)
+    checkpoint_file = os.path.join(cache_dir, "rebuild_checkpoint.json")
+    checkpoint = {'folder': os.path.abspath(folder), 'parser_version': PARSER_VERSION,
+                  'formula_version': FORMULA_VERSION, 'done': [], 'failed': []}
+    if os.path.exists(checkpoint_file):
+        try:
+            with open(checkpoint_file, 'r') as f:
+                saved = json.load(f)
+            if all(saved.get(key) == checkpoint[key] for key in ('folder', 'parser_version', 'formula_version')):
+                checkpoint = dict(saved, failed=saved.get('failed', []))
+        except ValueError:
+            pass
+
+    def save_checkpoint():
+        temp_path = f"{checkpoint_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, checkpoint_file)
+
+    done = set(checkpoint['done'])
+    file_names = [file_name for file_name in list_replay_files(folder) if file_name not in done]
+    file_paths = [os.path.join(folder, file_name) for file_name in file_names]
+    total = len(done) + len(file_names)
+    # Failures from before an interruption are counted along with this run's
+    failed = len(checkpoint['failed'])
+    completed = len(done)
+    stopped = False
+    for file_path, entry in stream_process_files(file_paths, cache_dir, max_workers):
+        checkpoint['done'].append(os.path.basename(file_path))
+        completed += 1
+        if entry is None:
+            checkpoint['failed'].append(os.path.basename(file_path))
+            failed += 1
+        if completed % checkpoint_every == 0:
+            save_checkpoint()
+        if on_progress is not None:
+            on_progress(completed, total)
+        if should_stop is not None and should_stop():
+            stopped = True
+            break
+
+    if stopped:
+        save_checkpoint()
+    elif os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    return completed, failed
+
+def shard_of(file_path, shard_count):
+    # Keyed on the file name so the assignment is the same on every node and stable as the archive grows
+    return int(hashlib.sha1(os.path.basename(file_path).encode('utf-8')).hexdigest(), 16) % shard_count
+
+def shard_dir_name(shard_index, shard_count):
+    return f"shard-{shard_index:04d}-of-{shard_count:04d}"
+
+def accumulate_replay(players, result, sign=1):
+    round_stats, overall_stats, winner = result
+    for player, stats in overall_stats.items():
+        summary = players.setdefault(player, {
+            'games': 0, 'wins': 0, 'sums': {stat: 0 for stat in STAT_RANGES},
+            'bests': {stat: 0 for stat in STAT_RANGES}, 'matchups': {}})
+        summary['games'] += sign
+        if player == winner:
+            summary['wins'] += sign
+        for stat in STAT_RANGES:
+            summary['sums'][stat] += sign * stats[stat]
+            summary['bests'][stat] = max(summary['bests'][stat], stats[stat])
+        for opponent in overall_stats:
+            if opponent != player:
+                matchup = summary['matchups'].setdefault(opponent, {'wins': 0, 'losses': 0})
+                matchup['wins' if player == winner else 'losses'] += sign
+
+def process_shard(file_paths, shard_index, shard_count, out_dir, max_workers=None):
+    shard_dir = os.path.join(out_dir, shard_dir_name(shard_index, shard_count))
+    cache_dir = os.path.join(shard_dir, "cache")
+    selected = [file_path for file_path in file_paths if shard_of(file_path, shard_count) == shard_index]
+
+    shard_result = {
+        'shard': shard_index,
+        'shards': shard_count,
+        'parser_version': PARSER_VERSION,
+        'formula_version': FORMULA_VERSION,
+        'files': [],
+        'failed': [],
+        'replays': {},
+        'players': {}
+    }
+    for file_path, entry in stream_process_files(selected, cache_dir, max_workers):
+        file_name = os.path.basename(file_path)
+        shard_result['files'].append(file_name)
+        if entry is None:
+            shard_result['failed'].append(file_name)
+        elif entry['replay_id'] not in shard_result['replays']:
+            shard_result['replays'][entry['replay_id']] = file_name
+            accumulate_replay(shard_result['players'], entry['result'])
+
+    # partial.json is written last so its presence marks the shard as complete
+    temp_path = os.path.join(shard_dir, "partial.json.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(shard_result, f)
+    os.replace(temp_path, os.path.join(shard_dir, "partial.json"))
+    return shard_result
+
+def merge_shards(out_dir, cache_dir):
+    shard_results = []
+    for name in sorted(os.listdir(out_dir)):
+        partial_file = os.path.join(out_dir, name, "partial.json")
+        if name.startswith("shard-") and os.path.exists(partial_file):
+            with open(partial_file, 'r') as f:
+                shard_results.append((os.path.join(out_dir, name), json.load(f)))
+    if not shard_results:
+        raise ValueError(f"No finished shards in {out_dir}")
+
+    shard_count = shard_results[0][1]['shards']
+    found = {shard_result['shard'] for _, shard_result in shard_results if shard_result['shards'] == shard_count}
+    missing = sorted(set(range(shard_count)) - found)
+    if missing or len(shard_results) != shard_count:
+        raise ValueError(f"Shards missing or from a different run: expected {shard_count}, missing {missing}")
+
+    library = {'shards': shard_count, 'files': [], 'failed': [], 'replays': {}, 'players': {}}
+    os.makedirs(os.path.join(cache_dir, "content"), exist_ok=True)
+    for shard_dir, shard_result in shard_results:
+        shard_cache = os.path.join(shard_dir, "cache")
+        for root, _, file_names in os.walk(shard_cache):
+            target = os.path.join(cache_dir, os.path.relpath(root, shard_cache))
+            os.makedirs(target, exist_ok=True)
+            for file_name in file_names:
+                shutil.copy2(os.path.join(root, file_name), os.path.join(target, file_name))
+
+        library['files'].extend(shard_result['files'])
+        library['failed'].extend(shard_result['failed'])
+        for player, summary in shard_result['players'].items():
+            merged = library['players'].setdefault(player, {
+                'games': 0, 'wins': 0, 'sums': {stat: 0 for stat in STAT_RANGES},
+                'bests': {stat: 0 for stat in STAT_RANGES}, 'matchups': {}})
+            merged['games'] += summary['games']
+            merged['wins'] += summary['wins']
+            for stat in STAT_RANGES:
+                merged['sums'][stat] += summary['sums'][stat]
+                merged['bests'][stat] = max(merged['bests'][stat], summary['bests'][stat])
+            for opponent, matchup in summary['matchups'].items():
+                merged_matchup = merged['matchups'].setdefault(opponent, {'wins': 0, 'losses': 0})
+                merged_matchup['wins'] += matchup['wins']
+                merged_matchup['losses'] += matchup['losses']
+
+        # Copies of one replay that landed in different shards are counted once
+        for replay_id, file_name in shard_result['replays'].items():
+            if replay_id in library['replays']:
+                cache_file, _ = cache_paths(file_name, shard_cache)
+                with open(cache_file, 'r') as f:
+                    accumulate_replay(library['players'], json.load(f)['result'], sign=-1)
+            else:
+                library['replays'][replay_id] = file_name
+
+    temp_path = os.path.join(out_dir, "library.json.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(library, f)
+    os.replace(temp_path, os.path.join(out_dir, "library.json"))
+    return library
+
+def list_replay_files(folder):
+    return sorted(file_name for file_name in os.listdir(folder) if file_name.endswith('.ttrm'))
+
+def iter_export_rows(file_name, result):
+    round_stats, overall_stats, winner = result
+    for round_index, players in enumerate(round_stats, 1):
+        for username, stats in players.items():
+            yield [file_name, round_index, username, username == winner] + [stats[stat] for stat in STAT_RANGES]
+    for username, stats in overall_stats.items():
+        yield [file_name, 0, username, username == winner] + [stats[stat] for stat in STAT_RANGES]
+
+def write_export_batch(rows, export_format, out_dir, writers):
+    if export_format == 'csv':
+        csv_path = os.path.join(out_dir, "library.csv")
+        if 'csv' not in writers:
+            new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            writers['file'] = open(csv_path, 'a', newline='')
+            writers['csv'] = csv.writer(writers['file'])
+            if new_file:
+                writers['csv'].writerow(EXPORT_COLUMNS)
+        writers['csv'].writerows(rows)
+        return
+
+    schema = pa.schema([('replay', pa.string()), ('round', pa.int32()), ('username', pa.string()), ('won', pa.bool_())]
+                       + [(stat, pa.float64()) for stat in STAT_RANGES])
+    table = pa.table({column: [row[i] for row in rows] for i, column in enumerate(EXPORT_COLUMNS)}, schema=schema)
+    if 'arrow' not in writers:
+        extension = 'parquet' if export_format == 'parquet' else 'arrow'
+        part_path = os.path.join(out_dir, f"part-{writers['part']:05d}.{extension}")
+        if export_format == 'parquet':
+            writers['arrow'] = pq.ParquetWriter(part_path, table.schema)
+        else:
+            writers['file'] = pa.OSFile(part_path, 'wb')
+            writers['arrow'] = pa.ipc.new_file(writers['file'], table.schema)
+    writers['arrow'].write_table(table)
+
+def save_export_state(state_file, state, done_files, exported_ids, out_dir):
+    state['files'].extend(done_files)
+    state['replay_ids'] = sorted(exported_ids)
+    csv_path = os.path.join(out_dir, "library.csv")
+    if state['format'] == 'csv' and os.path.exists(csv_path):
+        state['csv_size'] = os.path.getsize(csv_path)
+    temp_path = f"{state_file}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_file)
+
+def export_library(folder, cache_dir, out_dir, export_format='csv', batch_size=50000):
+    if export_format not in ('csv', 'parquet', 'arrow'):
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format != 'csv' and pa is None:
+        raise ImportError("pyarrow is required for Parquet and Arrow export")
+
+    os.makedirs(out_dir, exist_ok=True)
+    state_file = os.path.join(out_dir, "_export_state.json")
+    state = {'format': export_format, 'files': [], 'parts': 0}
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        if state['format'] != export_format:
+            raise ValueError(f"{out_dir} already holds a {state['format']} export")
+
+    csv_path = os.path.join(out_dir, "library.csv")
+    if export_format == 'csv' and os.path.exists(csv_path):
+        # Rows appended after the last saved state belong to an interrupted run and are exported again below
+        with open(csv_path, 'r+') as f:
+            f.truncate(state.get('csv_size', 0))
+
+    exported = set(state['files'])
+    exported_ids = set(state.get('replay_ids', []))
+    new_files = [file_name for file_name in list_replay_files(folder) if file_name not in exported]
+
+    writers = {'part': state['parts']}
+    rows = []
+    row_count = 0
+    done_files = []
+    try:
+        file_paths = [os.path.join(folder, file_name) for file_name in new_files]
+        for file_path, entry in stream_process_files(file_paths, cache_dir):
+            # Failed replays stay unexported so they are picked up once fixed
+            if entry is None:
+                continue
+            file_name = os.path.basename(file_path)
+            done_files.append(file_name)
+            # Copies of an already exported replay add no rows
+            if entry['replay_id'] not in exported_ids:
+                exported_ids.add(entry['replay_id'])
+                rows.extend(iter_export_rows(file_name, entry['result']))
+            if len(rows) >= batch_size:
+                write_export_batch(rows, export_format, out_dir, writers)
+                row_count += len(rows)
+                rows = []
+                if export_format == 'csv':
+                    # CSV rows go straight into library.csv, so the state follows every batch
+                    writers['file'].flush()
+                    save_export_state(state_file, state, done_files, exported_ids, out_dir)
+                    done_files = []
+        if rows:
+            write_export_batch(rows, export_format, out_dir, writers)
+            row_count += len(rows)
+    finally:
+        if 'arrow' in writers:
+            writers['arrow'].close()
+        if 'file' in writers:
+            writers['file'].close()
+
+    # Only remember the files once their rows are safely on disk
+    if 'arrow' in writers:
+        state['parts'] += 1
+    save_export_state(state_file, state, done_files, exported_ids, out_dir)
+    return row_count
+
+def dedupe_entries(entries):
+    # The alphabetically first file of each replay is kept, the others map to it
+    files_by_replay = {}
+    for file_name, entry in entries.items():
+        files_by_replay.setdefault(entry['replay_id'], []).append(file_name)
+    unique = {}
+    duplicates = {}
+    for file_names in files_by_replay.values():
+        canonical, *copies = sorted(file_names)
+        unique[canonical] = entries[canonical]
+        for file_name in copies:
+            duplicates[file_name] = canonical
+    return unique, duplicates
+
+def build_player_profiles(results):
+    profiles = {}
+    for round_stats, overall_stats, winner in results:
+        for player, stats in overall_stats.items():
+            if player not in profiles:
+                profiles[player] = PlayerProfile(player)
+            profiles[player].add_game(stats)
+            for opponent in overall_stats:
+                if opponent != player:
+                    profiles[player].add_matchup(opponent, 'win' if player == winner else 'loss')
+    return profiles
+
+class LibraryAPI:
+    def __init__(self, folder, cache_dir, cache_size=256):
+        self.folder = folder
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.responses = OrderedDict()
+        self.replays = {}
+        self.metrics = {}
+        self.duplicates = {}
+        self.profiles = {}
+        self.ratings = RatingEngine(os.path.join(cache_dir, "ratings.json"))
+        self.load()
+
+    def load(self):
+        file_paths = [os.path.join(self.folder, file_name) for file_name in list_replay_files(self.folder)]
+        entries = {os.path.basename(file_path): entry for file_path, entry in stream_process_files(file_paths, self.cache_dir)
+                   if entry is not None}
+        unique, duplicates = dedupe_entries(entries)
+        replays = {file_name: entry['result'] for file_name, entry in unique.items()}
+        metrics = {file_name: entry.get('metrics', {}) for file_name, entry in unique.items()}
+        profiles = build_player_profiles(replays.values())
+        self.ratings.add_replays(unique.values())
+        self.ratings.save()
+        with self.lock:
+            self.replays = replays
+            self.metrics = metrics
+            self.duplicates = duplicates
+            self.profiles = profiles
+            self.responses.clear()
+
+    def player_summary(self, profile):
+        return {'username': profile.username, 'games_played': profile.games_played, 'averages': profile.get_averages(),
+                'rating': self.ratings.get_rating(profile.username)}
+
+    def route(self, path):
+        parts = [unquote(part) for part in urlsplit(path).path.strip('/').split('/') if part]
+        if parts == ['replays']:
+            return [{'file': file_name, 'players': list(overall_stats), 'winner': winner, 'rounds': len(round_stats),
+                     'duplicates': sorted(name for name, canonical in self.duplicates.items() if canonical == file_name)}
+                    for file_name, (round_stats, overall_stats, winner) in self.replays.items()]
+        if len(parts) == 2 and parts[0] == 'replays' and parts[1] in self.replays:
+            round_stats, overall_stats, winner = self.replays[parts[1]]
+            return {'file': parts[1], 'rounds': round_stats, 'overall': overall_stats, 'winner': winner,
+                    'metrics': self.metrics.get(parts[1], {})}
+        if parts == ['players']:
+            return [self.player_summary(profile) for profile in self.profiles.values()]
+        if len(parts) == 2 and parts[0] == 'players' and parts[1] in self.profiles:
+            profile = self.profiles[parts[1]]
+            summary = self.player_summary(profile)
+            summary.update({
+                'personal_bests': profile.get_personal_bests(),
+                'matchups': profile.get_matchup_history(),
+                'play_style': analyze_play_style(profile),
+                'suggestions': get_improvement_suggestions(profile)
+            })
+            return summary
+        if parts == ['aggregates']:
+            averages = [profile.get_averages() for profile in self.profiles.values()]
+            return {
+                'replays': len(self.replays),
+                'players': len(self.profiles),
+                'averages': {stat: sum(avg[stat] for avg in averages) / len(averages) if averages else 0 for stat in STAT_RANGES},
+                'wins': {player: sum(matchup['wins'] for matchup in profile.matchups.values())
+                         for player, profile in self.profiles.items()}
+            }
+        return None
+
+    def render(self, path):
+        with self.lock:
+            if path in self.responses:
+                self.responses.move_to_end(path)
+                return self.responses[path]
+
+        data = self.route(path)
+        if data is None:
+            return None
+        body = json.dumps(data).encode('utf-8')
+        response = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+
+        with self.lock:
+            self.responses[path] = response
+            self.responses.move_to_end(path)
+            while len(self.responses) > self.cache_size:
+                self.responses.popitem(last=False)
+        return response
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored on both sides
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag.replace('W/', '', 1) in [tag.replace('W/', '', 1) for tag in tags]
+
+class LibraryRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        response = self.server.api.render(self.path)
+        if response is None:
+            self.send_error(404, "Not found")
+            return
+
+        body, etag = response
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_library(folder, cache_dir, host='127.0.0.1', port=8765, cache_size=256):
+    server = ThreadingHTTPServer((host, port), LibraryRequestHandler)
+    server.api = LibraryAPI(folder, cache_dir, cache_size)
+    print(f"Serving {folder} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def trend_bucket(timestamp, granularity):
+    moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if granularity == 'day':
+        return moment.strftime('%Y-%m-%d')
+    year, week, _ = moment.isocalendar()
+    return f"{year}-W{week:02d}"
+
+class TrendStore:
+    def __init__(self, path):
+        self.path = path
+        self.replay_ids = set()
+        self.buckets = {granularity: {} for granularity in TREND_GRANULARITIES.values()}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                # Buckets summed under an older parser or formula are dropped and rebuilt by the next scan
+                if data.get('parser_version') == PARSER_VERSION and data.get('formula_version') == FORMULA_VERSION:
+                    self.replay_ids = set(data['replay_ids'])
+                    self.buckets = data['buckets']
+                else:
+                    self.dirty = True
+            except (ValueError, KeyError):
+                pass
+
+    def add_replay(self, entry):
+        if entry['replay_id'] in self.replay_ids or not entry.get('timestamp'):
+            return False
+        try:
+            buckets = {granularity: trend_bucket(entry['timestamp'], granularity) for granularity in self.buckets}
+        except ValueError:
+            return False
+
+        self.replay_ids.add(entry['replay_id'])
+        round_stats, overall_stats, winner = entry['result']
+        for granularity, players in self.buckets.items():
+            for player, stats in overall_stats.items():
+                bucket = players.setdefault(player, {}).setdefault(buckets[granularity], {
+                    'games': 0, 'wins': 0, 'sums': {stat: 0 for stat in STAT_RANGES}})
+                bucket['games'] += 1
+                if player == winner:
+                    bucket['wins'] += 1
+                for stat in STAT_RANGES:
+                    bucket['sums'][stat] += stats[stat]
+        self.dirty = True
+        return True
+
+    def clear(self):
+        self.replay_ids = set()
+        self.buckets = {granularity: {} for granularity in self.buckets}
+        self.dirty = True
+
+    def get_players(self):
+        return sorted(self.buckets['day'])
+
+    def get_trend(self, player, granularity, stat):
+        buckets = self.buckets[granularity].get(player, {})
+        return [(bucket, data['sums'][stat] / data['games']) for bucket, data in sorted(buckets.items())]
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'parser_version': PARSER_VERSION, 'formula_version': FORMULA_VERSION,
+                       'replay_ids': sorted(self.replay_ids), 'buckets': self.buckets}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+class RatingEngine:
+    def __init__(self, path, k_factor=32, initial_rating=1500, checkpoint_interval=1000, saved_checkpoint_interval=10000,
+                 load=True):
+        self.path = path
+        self.k_factor = k_factor
+        self.initial_rating = initial_rating
+        self.checkpoint_interval = checkpoint_interval
+        self.saved_checkpoint_interval = saved_checkpoint_interval
+        # Games are [timestamp, replay_id, winner, losers] kept in chronological order
+        self.games = []
+        self.replay_ids = set()
+        self.ratings = {}
+        # Ratings as they were before the game at each checkpoint index, only every
+        # saved_checkpoint_interval games of them are written to disk
+        self.checkpoints = {0: {}}
+        self.dirty = False
+        self.loaded = False
+        if load:
+            self.load()
+
+    def load(self):
+        self.loaded = True
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self.games = data['games']
+                self.ratings = data['ratings']
+                self.checkpoints.update({int(index): ratings for index, ratings in data.get('checkpoints', {}).items()})
+                self.replay_ids = {game[1] for game in self.games}
+            except (ValueError, KeyError):
+                pass
+
+    def game_from_entry(self, entry):
+        round_stats, overall_stats, winner = entry['result']
+        if not entry.get('timestamp') or winner not in overall_stats:
+            return None
+        return [entry['timestamp'], entry['replay_id'], winner, sorted(player for player in overall_stats if player != winner)]
+
+    def add_replays(self, entries):
+        new_games = []
+        for entry in entries:
+            game = self.game_from_entry(entry)
+            if game is not None and game[1] not in self.replay_ids:
+                self.replay_ids.add(game[1])
+                new_games.append(game)
+        if not new_games:
+            return 0
+
+        new_games.sort()
+        played = len(self.games)
+        start = bisect.bisect_left(self.games, new_games[0])
+        self.games = sorted(self.games + new_games)
+        if start == played:
+            # Everything landed after the last rated game so the current ratings carry on
+            self.apply_games(played)
+        else:
+            self.replay_from(start)
+        return len(new_games)
+
+    def replay_from(self, start):
+        # After a load only the saved checkpoints exist, replaying from the nearest one fills in the rest
+        checkpoint = max(index for index in self.checkpoints if index <= start)
+        self.checkpoints = {index: ratings for index, ratings in self.checkpoints.items() if index <= checkpoint}
+        self.ratings = {player: dict(rating) for player, rating in self.checkpoints[checkpoint].items()}
+        self.apply_games(checkpoint)
+
+    def rebuild(self):
+        self.checkpoints = {0: {}}
+        self.replay_from(0)
+
+    def apply_games(self, start):
+        for index in range(start, len(self.games)):
+            if index % self.checkpoint_interval == 0 and index not in self.checkpoints:
+                self.checkpoints[index] = {player: dict(rating) for player, rating in self.ratings.items()}
+            timestamp, replay_id, winner, losers = self.games[index]
+            for player in [winner] + losers:
+                if player not in self.ratings:
+                    self.ratings[player] = {'rating': self.initial_rating, 'games': 0}
+            for loser in losers:
+                expected = 1 / (1 + 10 ** ((self.ratings[loser]['rating'] - self.ratings[winner]['rating']) / 400))
+                change = self.k_factor * (1 - expected)
+                self.ratings[winner]['rating'] += change
+                self.ratings[loser]['rating'] -= change
+            for player in [winner] + losers:
+                self.ratings[player]['games'] += 1
+        self.dirty = True
+
+    def get_rating(self, player):
+        return self.ratings.get(player)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            checkpoints = {index: ratings for index, ratings in self.checkpoints.items()
+                           if index and index % self.saved_checkpoint_interval == 0}
+            json.dump({'games': self.games, 'ratings': self.ratings, 'checkpoints': checkpoints}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+def stat_vector(stats):
+    return np.array([normalize_stat(stats[stat], stat) for stat in RADAR_STATS])
+
+class SimilarityIndex:
+    def __init__(self):
+        self.players = []
+        self.rows = {}
+        self.vectors = np.zeros((64, len(RADAR_STATS)))
+        self.sums = {}
+        self.counts = {}
+        self.replay_ids = set()
+
+    def __len__(self):
+        return len(self.players)
+
+    def add_replay(self, entry):
+        if entry['replay_id'] in self.replay_ids:
+            return
+        self.replay_ids.add(entry['replay_id'])
+        round_stats, overall_stats, winner = entry['result']
+        for player, stats in overall_stats.items():
+            if player not in self.sums:
+                self.sums[player] = np.zeros(len(RADAR_STATS))
+                self.counts[player] = 0
+            self.sums[player] += [stats[stat] for stat in RADAR_STATS]
+            self.counts[player] += 1
+            self.update_player(player, dict(zip(RADAR_STATS, self.sums[player] / self.counts[player])))
+
+    def update_player(self, player, averages):
+        # Only the changed player's row is rewritten, the matrix grows by doubling
+        if player not in self.rows:
+            if len(self.players) == len(self.vectors):
+                self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+            self.rows[player] = len(self.players)
+            self.players.append(player)
+        self.vectors[self.rows[player]] = stat_vector(averages)
+
+    def nearest(self, vector, count=10, exclude=None):
+        if not self.players:
+            return []
+        distances = np.linalg.norm(self.vectors[:len(self.players)] - vector, axis=1)
+        if exclude in self.rows:
+            distances[self.rows[exclude]] = np.inf
+        count = min(count, len(self.players) - (1 if exclude in self.rows else 0))
+        if count <= 0:
+            return []
+        closest = np.argpartition(distances, count - 1)[:count]
+        closest = closest[np.argsort(distances[closest])]
+        return [(self.players[row], float(distances[row])) for row in closest]
+
+    def similar_to(self, player, count=10):
+        if player not in self.rows:
+            return []
+        return self.nearest(self.vectors[self.rows[player]], count, exclude=player)
+
+def name_trigrams(name):
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+class PlayerIndex:
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.sorted_names = []
+        self.trigrams = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.lower() in self.ids
+
+    def add(self, name):
+        key = name.lower()
+        if key in self.ids:
+            return
+        self.ids[key] = len(self.names)
+        self.names.append(name)
+        bisect.insort(self.sorted_names, key)
+        for trigram in name_trigrams(key):
+            self.trigrams.setdefault(trigram, set()).add(self.ids[key])
+
+    def search(self, text, limit=20):
+        query = text.lower()
+        if not query:
+            return []
+        found = []
+        seen = set()
+
+        def accept(key):
+            if key not in seen:
+                seen.add(key)
+                found.append(self.names[self.ids[key]])
+            return len(found) >= limit
+
+        # Prefix matches come from a binary search over the sorted names
+        start = bisect.bisect_left(self.sorted_names, query)
+        for key in self.sorted_names[start:]:
+            if not key.startswith(query) or accept(key):
+                break
+        if len(found) >= limit:
+            return found
+
+        # Substring matches are verified against the names sharing all of the query's trigrams
+        trigrams = name_trigrams(query)
+        if trigrams:
+            postings = sorted((self.trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+            for name_id in sorted(candidates, key=lambda name_id: self.names[name_id].lower()):
+                key = self.names[name_id].lower()
+                if query in key and accept(key):
+                    return found
+        else:
+            for key in self.sorted_names:
+                if query in key and accept(key):
+                    return found
+
+        # Fuzzy matches are ranked among the names sharing the most trigrams with the query
+        if len(trigrams) >= 2:
+            shared = {}
+            for trigram in trigrams:
+                for name_id in self.trigrams.get(trigram, ()):
+                    shared[name_id] = shared.get(name_id, 0) + 1
+            candidates = sorted(shared, key=shared.get, reverse=True)[:200]
+            scored = []
+            for name_id in candidates:
+                key = self.names[name_id].lower()
+                if key not in seen:
+                    ratio = difflib.SequenceMatcher(None, query, key).ratio()
+                    if ratio >= 0.7:
+                        scored.append((ratio, key))
+            for ratio, key in sorted(scored, key=lambda item: (-item[0], item[1])):
+                if accept(key):
+                    break
+        return found
+
+def deep_sizeof(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(key) + deep_sizeof(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_sizeof(item) for item in value)
+    return size
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+        self.discard(key)
+        size = deep_sizeof(value)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def discard(self, key):
+        if key in self.entries:
+            _, size = self.entries.pop(key)
+            self.size -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+def chart_angles(count):
+    return np.linspace(0, 2*np.pi, count, endpoint=False)
+
+def chart_geometry(width, height):
+    return width / 2, height / 2, min(width, height) / 2 - 60
+
+# Axes and labels do not depend on the data, so they are drawn once and reused.
+# Only the newest size is kept per label set, resizing a widget replaces the old image.
+CHART_BACKGROUNDS = {}
+
+def chart_background(labels, width, height):
+    key = tuple(labels)
+    cached = CHART_BACKGROUNDS.get(key)
+    if cached is not None and cached[0] == (width, height):
+        return cached[1]
+
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    center_x, center_y, radius = chart_geometry(width, height)
+    angles = chart_angles(len(labels))
+
+    painter.setPen(QPen(QColor(100, 100, 100), 1))
+    for angle in angles:
+        x = center_x + radius * np.cos(angle)
+        y = center_y + radius * np.sin(angle)
+        painter.drawLine(int(center_x), int(center_y), int(x), int(y))
+
+    painter.setPen(QColor(200, 200, 200))
+    for i, label in enumerate(labels):
+        angle = angles[i]
+        x = center_x + (radius + 30) * np.cos(angle)
+        y = center_y + (radius + 30) * np.sin(angle)
+        
+        flags = Qt.AlignCenter
+        if x < center_x:
+            flags |= Qt.AlignRight
+        elif x > center_x:
+            flags |= Qt.AlignLeft
+        if y < center_y:
+            flags |= Qt.AlignBottom
+        elif y > center_y:
+            flags |= Qt.AlignTop
+        
+        rect = painter.boundingRect(int(x-50), int(y-10), 100, 20, flags, label)
+        painter.drawText(rect, flags, label)
+
+    painter.end()
+    CHART_BACKGROUNDS[key] = ((width, height), image)
+    return image
 
 class RadarChart(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.stats = {}
         self.players = []
-        self.stat_names = ['PPS', 'APM', 'VS Score', 'APP', 'DS/Piece', 'DS/Second', 'Garbage Efficiency']
+        self.stat_names = list(RADAR_STATS)
 
     def set_data(self, stats):
         self.stats = stats
@@ -207,40 +1637,14 @@ class RadarChart(QWidget):
             return
 
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        self.paint(painter, self.width(), self.height())
 
-        width = self.width()
-        height = self.height()
-        center_x = width / 2
-        center_y = height / 2
-        radius = min(width, height) / 2 - 60
+    def paint(self, painter, width, height):
+        painter.drawImage(0, 0, chart_background(self.stat_names, width, height))
+        painter.setRenderHint(QPainter.Antialiasing)
 
-        angles = np.linspace(0, 2*np.pi, len(self.stat_names), endpoint=False)
-
-        painter.setPen(QPen(QColor(100, 100, 100), 1))
-        for angle in angles:
-            x = center_x + radius * np.cos(angle)
-            y = center_y + radius * np.sin(angle)
-            painter.drawLine(int(center_x), int(center_y), int(x), int(y))
-
-        painter.setPen(QColor(200, 200, 200))
-        for i, stat in enumerate(self.stat_names):
-            angle = angles[i]
-            x = center_x + (radius + 30) * np.cos(angle)
-            y = center_y + (radius + 30) * np.sin(angle)
-            
-            flags = Qt.AlignCenter
-            if x < center_x:
-                flags |= Qt.AlignRight
-            elif x > center_x:
-                flags |= Qt.AlignLeft
-            if y < center_y:
-                flags |= Qt.AlignBottom
-            elif y > center_y:
-                flags |= Qt.AlignTop
-            
-            rect = painter.boundingRect(int(x-50), int(y-10), 100, 20, flags, stat)
-            painter.drawText(rect, flags, stat)
+        center_x, center_y, radius = chart_geometry(width, height)
+        angles = chart_angles(len(self.stat_names))
 
         colors = generate_distinct_colors(len(self.players))
         for i, (player, player_stats) in enumerate(self.stats.items()):
@@ -255,12 +1659,12 @@ class RadarChart(QWidget):
             for j in range(len(points)):
                 painter.drawLine(points[j][0], points[j][1], points[(j+1)%len(points)][0], points[(j+1)%len(points)][1])
 
-        self.draw_legend(painter)
+        self.draw_legend(painter, height)
 
-    def draw_legend(self, painter):
+    def draw_legend(self, painter, height=None):
         colors = generate_distinct_colors(len(self.players))
         legend_x = 10
-        legend_y = self.height() - 30
+        legend_y = (self.height() if height is None else height) - 30
         
         for i, player in enumerate(self.players):
             painter.setPen(QPen(colors[i], 2))
@@ -269,8 +1673,53 @@ class RadarChart(QWidget):
             painter.drawText(legend_x + 25, legend_y + 15, player)
             legend_x += 175
 
-class ManualInputDialog(QDialog):
+class WhatIfHeatmap(QWidget):
     def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.marker = None
+        self.setMinimumSize(400, 300)
+
+    def set_slice(self, values, marker):
+        # values is a PPS x APM slice normalized to 0..1, APM is drawn increasing upwards
+        values = np.clip(values.T[::-1], 0, 1)
+        rgb = np.empty(values.shape + (3,), dtype=np.uint8)
+        rgb[..., 0] = values * 255
+        rgb[..., 1] = 80 + 100 * (1 - np.abs(2 * values - 1))
+        rgb[..., 2] = (1 - values) * 255
+        rgb = np.ascontiguousarray(rgb)
+        height, width, _ = rgb.shape
+        self.image = QImage(rgb.data, width, height, width * 3, QImage.Format_RGB888).copy()
+        self.marker = marker
+        self.update()
+
+    def paintEvent(self, event):
+        if self.image is None:
+            return
+
+        painter = QPainter(self)
+        left, bottom = 50, 30
+        width = self.width() - left - 10
+        height = self.height() - bottom - 10
+        painter.drawImage(QRect(left, 10, width, height), self.image)
+
+        painter.setPen(QColor(200, 200, 200))
+        painter.drawText(left, self.height() - 10, "PPS")
+        painter.drawText(5, 20, "APM")
+        pps_high = WHAT_IF_RANGES['PPS'][1]
+        apm_high = WHAT_IF_RANGES['APM'][1]
+        painter.drawText(left + width - 30, self.height() - 10, f"{pps_high:g}")
+        painter.drawText(5, 40, f"{apm_high:g}")
+
+        if self.marker is not None:
+            x = left + min(max(self.marker[0], 0), 1) * width
+            y = 10 + (1 - min(max(self.marker[1], 0), 1)) * height
+            painter.setPen(QPen(QColor(255, 255, 255), 2))
+            painter.drawLine(int(x - 8), int(y), int(x + 8), int(y))
+            painter.drawLine(int(x), int(y - 8), int(x), int(y + 8))
+
+class ManualInputDialog(QDialog):
+    def __init__(self, parent=None, averages=None, resolution=64):
         super().__init__(parent)
         self.setWindowTitle("Manual Stat Input")
         layout = QVBoxLayout(self)
@@ -300,10 +1749,97 @@ class ManualInputDialog(QDialog):
         form_layout.addRow("VS Score:", self.vs_input)
         
         layout.addLayout(form_layout)
-        
+
+        # A profile's own play style stats are shown until the inputs are edited
+        self.profile_stats = None
+        if averages is not None:
+            self.pps_input.setValue(averages['PPS'])
+            self.apm_input.setValue(averages['APM'])
+            self.vs_input.setValue(averages['VS Score'])
+            self.profile_stats = play_style_stats(averages)
+
+        # What-if surface: every grid point is precomputed, moving a control only picks a slice
+        self.axes, self.grid = what_if_grid(resolution)
+        self.metric_selector = QComboBox()
+        self.metric_selector.addItems(['APP', 'DS/Piece', 'DS/Second', 'Garbage Efficiency', 'Damage Potential']
+                                      + list(PLAY_STYLE_AXES))
+        self.vs_slider = QSlider(Qt.Horizontal)
+        self.vs_slider.setRange(0, resolution - 1)
+        self.heatmap = WhatIfHeatmap()
+        self.threshold_label = QLabel()
+
+        what_if_layout = QFormLayout()
+        what_if_layout.addRow("What-if:", self.metric_selector)
+        what_if_layout.addRow("VS Score slice:", self.vs_slider)
+        layout.addLayout(what_if_layout)
+        layout.addWidget(self.heatmap)
+        layout.addWidget(self.threshold_label)
+
+        self.metric_selector.currentIndexChanged.connect(self.update_what_if)
+        self.vs_slider.valueChanged.connect(self.on_vs_slider)
+        self.vs_input.valueChanged.connect(self.on_vs_input)
+        self.pps_input.valueChanged.connect(self.on_input_edited)
+        self.apm_input.valueChanged.connect(self.on_input_edited)
+        self.sync_vs_slider()
+
+        self.find_similar = False
+
         submit_button = QPushButton("Submit")
         submit_button.clicked.connect(self.accept)
         layout.addWidget(submit_button)
+
+        similar_button = QPushButton("Find Similar Players")
+        similar_button.clicked.connect(self.accept_find_similar)
+        layout.addWidget(similar_button)
+
+    def accept_find_similar(self):
+        self.find_similar = True
+        self.accept()
+
+    def on_input_edited(self):
+        self.profile_stats = None
+        self.update_what_if()
+
+    def on_vs_input(self):
+        self.profile_stats = None
+        self.sync_vs_slider()
+
+    def on_vs_slider(self, index):
+        self.vs_input.blockSignals(True)
+        self.vs_input.setValue(self.axes['VS Score'][index])
+        self.vs_input.blockSignals(False)
+        self.on_input_edited()
+
+    def sync_vs_slider(self):
+        index = int(np.abs(self.axes['VS Score'] - self.vs_input.value()).argmin())
+        self.vs_slider.blockSignals(True)
+        self.vs_slider.setValue(index)
+        self.vs_slider.blockSignals(False)
+        self.update_what_if()
+
+    def update_what_if(self):
+        metric = self.metric_selector.currentText()
+        values = self.grid[metric][:, :, self.vs_slider.value()]
+        if metric in PLAY_STYLE_AXES:
+            values = values / (len(PLAY_STYLE_CATEGORIES) - 1)
+        else:
+            low, high = STAT_RANGES[metric]
+            values = (values - low) / (high - low)
+
+        pps, apm, vs = self.pps_input.value(), self.apm_input.value(), self.vs_input.value()
+        marker = (pps / WHAT_IF_RANGES['PPS'][1], apm / WHAT_IF_RANGES['APM'][1])
+        self.heatmap.set_slice(values, marker)
+
+        lines = []
+        stats = self.profile_stats
+        if stats is None:
+            stats = calculate_derived_stats_grid(pps, apm, vs)
+        for name, stat, value, category, next_threshold in threshold_distances(stats):
+            if next_threshold is None:
+                lines.append(f"{name}: {category} ({stat} {value:.2f}, top category)")
+            else:
+                lines.append(f"{name}: {category} ({stat} {value:.2f}, {next_threshold - value:.2f} to next at {next_threshold:g})")
+        self.threshold_label.setText("\n".join(lines))
         
     def get_values(self):
         return {
@@ -312,6 +1848,163 @@ class ManualInputDialog(QDialog):
             'VS Score': self.vs_input.value()
         }
 
+class TrendChart(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.points = []
+        self.stat = None
+
+    def set_data(self, points, stat):
+        self.points = points
+        self.stat = stat
+        self.update()
+
+    def paintEvent(self, event):
+        if not self.points:
+            return
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        left, top = 70, 20
+        width = self.width() - left - 20
+        height = self.height() - top - 50
+        values = [value for _, value in self.points]
+        low, high = min(values), max(values)
+        if high == low:
+            low, high = low - 1, high + 1
+
+        painter.setPen(QPen(QColor(100, 100, 100), 1))
+        painter.drawLine(left, top, left, top + height)
+        painter.drawLine(left, top + height, left + width, top + height)
+
+        painter.setPen(QColor(200, 200, 200))
+        painter.drawText(5, top + 10, f"{high:.2f}")
+        painter.drawText(5, top + height, f"{low:.2f}")
+        painter.drawText(left, top + height + 20, self.points[0][0])
+        last_label = self.points[-1][0]
+        painter.drawText(left + width - painter.fontMetrics().horizontalAdvance(last_label), top + height + 20, last_label)
+        painter.drawText(left, top + height + 40, self.stat)
+
+        step = width / max(len(self.points) - 1, 1)
+        points = [(int(left + i * step), int(top + height - (value - low) / (high - low) * height))
+                  for i, value in enumerate(values)]
+        painter.setPen(QPen(generate_distinct_colors(1)[0], 2))
+        for j in range(len(points) - 1):
+            painter.drawLine(points[j][0], points[j][1], points[j+1][0], points[j+1][1])
+        for x, y in points:
+            painter.drawEllipse(x - 2, y - 2, 4, 4)
+
+class TrendDialog(QDialog):
+    def __init__(self, trends, player=None, parent=None):
+        super().__init__(parent)
+        self.trends = trends
+        self.setWindowTitle("Trends")
+        self.resize(900, 500)
+        layout = QVBoxLayout(self)
+
+        self.player_selector = QComboBox()
+        self.player_selector.addItems(trends.get_players())
+        if player is not None:
+            self.player_selector.setCurrentText(player)
+        self.stat_selector = QComboBox()
+        self.stat_selector.addItems(list(STAT_RANGES))
+        self.granularity_selector = QComboBox()
+        self.granularity_selector.addItems(list(TREND_GRANULARITIES))
+
+        selector_layout = QHBoxLayout()
+        selector_layout.addWidget(self.player_selector)
+        selector_layout.addWidget(self.stat_selector)
+        selector_layout.addWidget(self.granularity_selector)
+        layout.addLayout(selector_layout)
+
+        self.chart = TrendChart()
+        layout.addWidget(self.chart)
+
+        self.player_selector.currentIndexChanged.connect(self.update_chart)
+        self.stat_selector.currentIndexChanged.connect(self.update_chart)
+        self.granularity_selector.currentIndexChanged.connect(self.update_chart)
+        self.update_chart()
+
+    def update_chart(self):
+        player = self.player_selector.currentText()
+        stat = self.stat_selector.currentText()
+        granularity = TREND_GRANULARITIES[self.granularity_selector.currentText()]
+        self.chart.set_data(self.trends.get_trend(player, granularity, stat), stat)
+
+class SimilarPlayersDialog(QDialog):
+    def __init__(self, title, matches, counts, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(500, 400)
+        layout = QVBoxLayout(self)
+
+        table = QTableWidget(len(matches), 3)
+        table.setHorizontalHeaderLabels(["Player", "Distance", "Games"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        for row, (player, distance) in enumerate(matches):
+            table.setItem(row, 0, QTableWidgetItem(player))
+            table.setItem(row, 1, QTableWidgetItem(f"{distance:.3f}"))
+            table.setItem(row, 2, QTableWidgetItem(str(counts.get(player, 0))))
+        layout.addWidget(table)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+class QuarantineDialog(QDialog):
+    def __init__(self, cache_dir, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        self.retried = False
+        self.setWindowTitle("Quarantined Replays")
+        self.resize(900, 400)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["File", "Error", "Message", "Parser Version"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        retry_button = QPushButton("Retry Selected")
+        retry_button.clicked.connect(self.retry_selected)
+        retry_all_button = QPushButton("Retry All")
+        retry_all_button.clicked.connect(self.retry_all)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(retry_button)
+        button_layout.addWidget(retry_all_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self.load_failures()
+
+    def load_failures(self):
+        failures = list_quarantined(self.cache_dir)
+        self.table.setRowCount(len(failures))
+        for row, failure in enumerate(failures):
+            values = [failure['file'], failure['error'], failure['message'], str(failure['parser_version'])]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+    def retry_selected(self):
+        rows = {index.row() for index in self.table.selectedIndexes()}
+        file_names = {self.table.item(row, 0).text() for row in rows}
+        if file_names:
+            clear_quarantine(self.cache_dir, file_names)
+            self.retried = True
+            self.load_failures()
+
+    def retry_all(self):
+        clear_quarantine(self.cache_dir)
+        self.retried = True
+        self.load_failures()
+
 class AttackDefenseSpeedChart(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -330,40 +2023,14 @@ class AttackDefenseSpeedChart(QWidget):
             return
 
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-
-        width = self.width()
-        height = self.height()
-        center_x = width / 2
-        center_y = height / 2
-        radius = min(width, height) / 2 - 60
+        self.paint(painter, self.width(), self.height())
 
-        angles = np.linspace(0, 2*np.pi, len(self.stat_names), endpoint=False)
+    def paint(self, painter, width, height):
+        painter.drawImage(0, 0, chart_background(self.display_names, width, height))
+        painter.setRenderHint(QPainter.Antialiasing)
 
-        painter.setPen(QPen(QColor(100, 100, 100), 1))
-        for angle in angles:
-            x = center_x + radius * np.cos(angle)
-            y = center_y + radius * np.sin(angle)
-            painter.drawLine(int(center_x), int(center_y), int(x), int(y))
-
-        painter.setPen(QColor(200, 200, 200))
-        for i, display_name in enumerate(self.display_names):
-            angle = angles[i]
-            x = center_x + (radius + 30) * np.cos(angle)
-            y = center_y + (radius + 30) * np.sin(angle)
-            
-            flags = Qt.AlignCenter
-            if x < center_x:
-                flags |= Qt.AlignRight
-            elif x > center_x:
-                flags |= Qt.AlignLeft
-            if y < center_y:
-                flags |= Qt.AlignBottom
-            elif y > center_y:
-                flags |= Qt.AlignTop
-            
-            rect = painter.boundingRect(int(x-50), int(y-10), 100, 20, flags, display_name)
-            painter.drawText(rect, flags, display_name)
+        center_x, center_y, radius = chart_geometry(width, height)
+        angles = chart_angles(len(self.stat_names))
 
         colors = generate_distinct_colors(len(self.players))
         for i, (player, player_stats) in enumerate(self.stats.items()):
@@ -378,12 +2045,12 @@ class AttackDefenseSpeedChart(QWidget):
             for j in range(len(points)):
                 painter.drawLine(points[j][0], points[j][1], points[(j+1)%len(points)][0], points[(j+1)%len(points)][1])
 
-        self.draw_legend(painter)
+        self.draw_legend(painter, height)
 
-    def draw_legend(self, painter):
+    def draw_legend(self, painter, height=None):
         colors = generate_distinct_colors(len(self.players))
         legend_x = 10
-        legend_y = self.height() - 30
+        legend_y = (self.height() if height is None else height) - 30
         
         for i, player in enumerate(self.players):
             painter.setPen(QPen(colors[i], 2))
@@ -392,6 +2059,138 @@ class AttackDefenseSpeedChart(QWidget):
             painter.drawText(legend_x + 25, legend_y + 15, player)
             legend_x += 175
 
+class LibraryScanThread(QThread):
+    scanned = pyqtSignal(list)
+    rated = pyqtSignal()
+
+    def __init__(self, file_paths, cache_dir, ratings, parent=None):
+        super().__init__(parent)
+        self.file_paths = file_paths
+        self.cache_dir = cache_dir
+        self.ratings = ratings
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        self.wait()
+
+    def run(self):
+        if not self.ratings.loaded:
+            self.ratings.load()
+        batch = []
+        # Entries arrive in completion order, rating them per batch would keep replaying from early checkpoints
+        entries = []
+        for file_path, entry in stream_process_files(self.file_paths, self.cache_dir):
+            if self.stopped:
+                return
+            if entry is not None:
+                batch.append((os.path.basename(file_path), entry))
+                entries.append(entry)
+            if len(batch) >= 200:
+                self.scanned.emit(batch)
+                batch = []
+        if batch:
+            self.scanned.emit(batch)
+        if self.ratings.add_replays(entries):
+            self.ratings.save()
+            self.rated.emit()
+
+class FolderListThread(QThread):
+    listed = pyqtSignal(list)
+
+    def __init__(self, folder, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+
+    def run(self):
+        if os.path.isdir(self.folder):
+            self.listed.emit(list_replay_files(self.folder))
+
+class RebuildThread(QThread):
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, folder, cache_dir, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.cache_dir = cache_dir
+        self.stopped = False
+        self.completed = 0
+        self.failed = 0
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        self.completed, self.failed = rebuild_library(self.folder, self.cache_dir, on_progress=self.progress.emit,
+                                                      should_stop=lambda: self.stopped)
+
+def init_offscreen_renderer():
+    # Render workers never need a display, whatever platform the user has configured
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    if QApplication.instance() is None:
+        # Kept on the function so the application lives as long as the worker process
+        init_offscreen_renderer.app = QApplication(sys.argv[:1])
+
+def render_card(title, stats, path, width=1200, height=650):
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(QColor('#2b2b2b'))
+    painter = QPainter(image)
+
+    title_font = QFont()
+    title_font.setPointSize(16)
+    title_font.setBold(True)
+    painter.setFont(title_font)
+    painter.setPen(QColor(255, 255, 255))
+    painter.drawText(0, 0, width, 50, Qt.AlignCenter, title)
+    painter.setFont(QFont())
+
+    chart_width = width // 2
+    chart_height = height - 50
+    for i, chart in enumerate((RadarChart(), AttackDefenseSpeedChart())):
+        chart.stats = stats
+        chart.players = list(stats)
+        painter.save()
+        painter.translate(i * chart_width, 50)
+        chart.paint(painter, chart_width, chart_height)
+        painter.restore()
+
+    painter.end()
+    # Light PNG compression, encoding dominates the cost of a card
+    image.save(path, 'PNG', 80)
+
+def render_card_batch(cards, width, height):
+    init_offscreen_renderer()
+    for title, stats, path in cards:
+        render_card(title, stats, path, width, height)
+    return len(cards)
+
+def card_file_name(name):
+    return re.sub(r'[^\w.-]', '_', name) + ".png"
+
+def render_library_cards(folder, cache_dir, out_dir, by='player', width=1200, height=650, max_workers=None, chunk_size=50):
+    file_paths = [os.path.join(folder, file_name) for file_name in list_replay_files(folder)]
+    entries = {os.path.basename(file_path): entry for file_path, entry in stream_process_files(file_paths, cache_dir)
+               if entry is not None}
+    unique, _ = dedupe_entries(entries)
+
+    os.makedirs(out_dir, exist_ok=True)
+    if by == 'player':
+        profiles = build_player_profiles(entry['result'] for entry in unique.values())
+        cards = [(f"{player} - {profile.games_played} games", {player: profile.get_averages()},
+                  os.path.join(out_dir, card_file_name(player)))
+                 for player, profile in sorted(profiles.items())]
+    else:
+        cards = []
+        for file_name, entry in sorted(unique.items()):
+            round_stats, overall_stats, winner = entry['result']
+            title = " vs ".join(overall_stats) + (f" - {winner} wins" if winner else "")
+            cards.append((title, overall_stats, os.path.join(out_dir, card_file_name(file_name))))
+
+    # Each worker keeps its own chart backgrounds, so cards go out in chunks rather than one at a time
+    chunks = [cards[i:i + chunk_size] for i in range(0, len(cards), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers, initializer=init_offscreen_renderer) as executor:
+        return sum(executor.map(render_card_batch, chunks, [width] * len(chunks), [height] * len(chunks)))
+
 class PlayerStatsWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -488,7 +2287,7 @@ class PlayerStatsWidget(QWidget):
         self.update()
 
 class ReplayAnalyzer(QMainWindow):
-    def __init__(self):
+    def __init__(self, result_cache_bytes=64 * 1024 * 1024, cache_dir=DEFAULT_CACHE_DIR):
         super().__init__()
 
         self.setWindowTitle("Tetr.io Replay Analyzer")
@@ -518,11 +2317,104 @@ class ReplayAnalyzer(QMainWindow):
 
         self.main_splitter.setSizes([200, 1000])
 
-        self.all_game_data = {}
+        # Parsed results of recently viewed files, kept within a memory budget in front of the disk cache
+        self.result_cache = ResultCache(result_cache_bytes)
         self.current_file = None
+        self.current_data = None
         self.current_folder = None
         self.player_profiles = {}
-        self.cache_dir = "replay_cache"
+        self.cache_dir = cache_dir
+        self.current_view = None
+        self.folder_thread = None
+        self.trends = TrendStore(os.path.join(self.cache_dir, "trends.json"))
+        # Loaded and updated by the library scan thread
+        self.ratings = RatingEngine(os.path.join(self.cache_dir, "ratings.json"), load=False)
+        self.similarity = SimilarityIndex()
+        self.player_index = PlayerIndex()
+        self.library_profiles = {}
+        self.library_replay_ids = set()
+        self.scan_thread = None
+        self.file_items = {}
+        self.replay_ids = {}
+        self.files_by_replay = {}
+
+        # Restored once the event loop runs so the window shows up first
+        QTimer.singleShot(0, self.restore_session)
+
+    def session_path(self):
+        return os.path.join(self.cache_dir, "session.json")
+
+    def save_session(self):
+        if not self.current_folder:
+            return
+        session = {
+            'folder': self.current_folder,
+            'files': [self.file_list.item(i).text() for i in range(self.file_list.count())],
+            'replay_ids': self.replay_ids,
+            'selection': [item.text() for item in self.file_list.selectedItems()],
+            'view': self.current_view
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.session_path()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(session, f)
+        os.replace(temp_path, self.session_path())
+
+    def restore_session(self):
+        if not os.path.exists(self.session_path()):
+            return
+        try:
+            with open(self.session_path(), 'r') as f:
+                session = json.load(f)
+        except ValueError:
+            return
+        if not os.path.isdir(session['folder']):
+            return
+
+        # The snapshot is shown as is, the folder listing and fingerprints are checked in the background
+        self.current_folder = session['folder']
+        self.set_file_list(session['files'], session['selection'])
+        self.replay_ids = session['replay_ids']
+        self.files_by_replay = {}
+        for file_name, replay_id in self.replay_ids.items():
+            self.files_by_replay.setdefault(replay_id, set()).add(file_name)
+        self.mark_duplicates(self.files_by_replay)
+
+        selected_items = self.file_list.selectedItems()
+        if len(selected_items) == 1:
+            self.on_file_select(selected_items[0])
+        elif session['view']:
+            self.show_combined_stats(session['view']['stats'], session['view']['winner'])
+
+        self.folder_thread = FolderListThread(self.current_folder, self)
+        self.folder_thread.listed.connect(self.on_folder_listed)
+        self.folder_thread.start()
+
+    def on_folder_listed(self, file_names):
+        current_names = [self.file_list.item(i).text() for i in range(self.file_list.count())]
+        if file_names != current_names:
+            self.set_file_list(file_names, [item.text() for item in self.file_list.selectedItems()])
+        self.start_library_scan(file_names)
+
+    def set_file_list(self, file_names, selection):
+        self.file_list.blockSignals(True)
+        self.file_list.clear()
+        self.file_list.addItems(file_names)
+        self.file_items = {self.file_list.item(i).text(): self.file_list.item(i) for i in range(self.file_list.count())}
+        for file_name in selection:
+            if file_name in self.file_items:
+                self.file_items[file_name].setSelected(True)
+        self.file_list.blockSignals(False)
+
+    def closeEvent(self, event):
+        if self.folder_thread is not None:
+            self.folder_thread.wait()
+        if self.scan_thread is not None:
+            self.scan_thread.stop()
+        self.save_session()
+        self.trends.save()
+        self.ratings.save()
+        super().closeEvent(event)
 
     def create_large_font(self):
         font = QFont()
@@ -530,7 +2422,10 @@ class ReplayAnalyzer(QMainWindow):
         return font
 
     def manual_input(self):
-        dialog = ManualInputDialog(self)
+        # Start from the selected player's averages so the what-if view shows how far they are from each threshold
+        player = self.profile_tabs.tabText(self.profile_tabs.currentIndex()) if self.profile_tabs.count() else None
+        averages = self.player_profiles[player].get_averages() if player in self.player_profiles else None
+        dialog = ManualInputDialog(self, averages)
         if dialog.exec_():
             manual_stats = dialog.get_values()
 
@@ -555,6 +2450,27 @@ class ReplayAnalyzer(QMainWindow):
             self.update_stats_display({'Manual Input': manual_stats})
             self.update_graphs({'Manual Input': manual_stats})
 
+            if dialog.find_similar:
+                matches = self.similarity.nearest(stat_vector(manual_stats))
+                SimilarPlayersDialog("Players Closest to Manual Input", matches, self.similarity.counts, self).exec_()
+
+    def show_similar_players(self, player):
+        if player not in self.similarity.rows and player in self.player_profiles:
+            self.similarity.update_player(player, self.player_profiles[player].get_averages())
+        matches = self.similarity.similar_to(player)
+        SimilarPlayersDialog(f"Players Most Like {player}", matches, self.similarity.counts, self).exec_()
+
+    def show_trends(self):
+        player = self.profile_tabs.tabText(self.profile_tabs.currentIndex()) if self.profile_tabs.count() else None
+        dialog = TrendDialog(self.trends, player, self)
+        dialog.exec_()
+
+    def show_quarantine(self):
+        dialog = QuarantineDialog(self.cache_dir, self)
+        dialog.exec_()
+        if dialog.retried:
+            self.result_cache.clear()
+
     def create_file_browser(self):
         file_frame = QWidget()
         file_layout = QVBoxLayout(file_frame)
@@ -575,11 +2491,23 @@ class ReplayAnalyzer(QMainWindow):
         manual_input_button = QPushButton("Manual Input")
         manual_input_button.clicked.connect(self.manual_input)
 
+        trends_button = QPushButton("Trends")
+        trends_button.clicked.connect(self.show_trends)
+
+        quarantine_button = QPushButton("Quarantine")
+        quarantine_button.clicked.connect(self.show_quarantine)
+
+        rebuild_button = QPushButton("Rebuild")
+        rebuild_button.clicked.connect(self.reprocess_all_files)
+
         button_layout = QHBoxLayout()
         button_layout.addWidget(select_button)
         button_layout.addWidget(refresh_button)
         button_layout.addWidget(analyze_button)
         button_layout.addWidget(manual_input_button)
+        button_layout.addWidget(trends_button)
+        button_layout.addWidget(quarantine_button)
+        button_layout.addWidget(rebuild_button)
 
         file_layout.addWidget(QLabel("Replay Files"))
         file_layout.addWidget(self.file_list)
@@ -593,7 +2521,18 @@ class ReplayAnalyzer(QMainWindow):
     
         self.player_filter = QLineEdit()
         self.player_filter.setPlaceholderText("Filter players...")
-        self.player_filter.textChanged.connect(self.filter_players)
+        # Typing restarts the timer so filtering and the library search run once the user pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.filter_players)
+        self.search_timer.timeout.connect(self.search_library_players)
+        self.player_filter.textChanged.connect(self.search_timer.start)
+
+        self.player_results = QListWidget()
+        self.player_results.setMaximumHeight(120)
+        self.player_results.setVisible(False)
+        self.player_results.itemClicked.connect(lambda item: self.show_library_profile(item.text()))
     
         self.round_selector = QComboBox()
         self.round_selector.currentIndexChanged.connect(self.on_round_select)
@@ -616,6 +2555,7 @@ class ReplayAnalyzer(QMainWindow):
     
         stats_layout.addWidget(QLabel("Replay Stats"))
         stats_layout.addWidget(self.player_filter)
+        stats_layout.addWidget(self.player_results)
         stats_layout.addWidget(self.round_selector)
         stats_layout.addWidget(splitter)
         stats_layout.addWidget(self.profile_tabs)
@@ -633,10 +2573,58 @@ class ReplayAnalyzer(QMainWindow):
 
     def refresh_files(self):
         if self.current_folder:
-            self.file_list.clear()
-            for file_name in os.listdir(self.current_folder):
-                if file_name.endswith('.ttrm'):
-                    self.file_list.addItem(file_name)
+            file_names = list_replay_files(self.current_folder)
+            self.set_file_list(file_names, [])
+            self.on_file_selection_changed()
+            self.start_library_scan(file_names)
+
+    def start_library_scan(self, file_names):
+        if self.scan_thread is not None:
+            self.scan_thread.stop()
+        self.replay_ids = {}
+        self.files_by_replay = {}
+        file_paths = [os.path.join(self.current_folder, file_name) for file_name in file_names]
+        self.scan_thread = LibraryScanThread(file_paths, self.cache_dir, self.ratings, self)
+        self.scan_thread.scanned.connect(self.on_library_scanned)
+        self.scan_thread.rated.connect(self.update_player_profiles_display)
+        self.scan_thread.finished.connect(self.trends.save)
+        self.scan_thread.start()
+
+    def on_library_scanned(self, batch):
+        touched = set()
+        for file_name, entry in batch:
+            self.replay_ids[file_name] = entry['replay_id']
+            self.files_by_replay.setdefault(entry['replay_id'], set()).add(file_name)
+            touched.add(entry['replay_id'])
+            self.trends.add_replay(entry)
+            self.similarity.add_replay(entry)
+            self.add_library_replay(entry)
+        self.mark_duplicates(touched)
+
+    def add_library_replay(self, entry):
+        if entry['replay_id'] in self.library_replay_ids:
+            return
+        self.library_replay_ids.add(entry['replay_id'])
+        round_stats, overall_stats, winner = entry['result']
+        for player, stats in overall_stats.items():
+            self.player_index.add(player)
+            if player not in self.library_profiles:
+                self.library_profiles[player] = PlayerProfile(player)
+            self.library_profiles[player].add_game(stats)
+            for opponent in overall_stats:
+                if opponent != player:
+                    self.library_profiles[player].add_matchup(opponent, 'win' if player == winner else 'loss')
+
+    def mark_duplicates(self, replay_ids):
+        for replay_id in replay_ids:
+            canonical, *copies = sorted(self.files_by_replay[replay_id])
+            if canonical in self.file_items:
+                self.file_items[canonical].setData(Qt.ForegroundRole, None)
+                self.file_items[canonical].setToolTip(f"{len(copies)} duplicate(s)" if copies else "")
+            for file_name in copies:
+                if file_name in self.file_items:
+                    self.file_items[file_name].setForeground(QColor(120, 120, 120))
+                    self.file_items[file_name].setToolTip(f"Duplicate of {canonical}")
 
     def select_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
@@ -645,6 +2633,7 @@ class ReplayAnalyzer(QMainWindow):
             self.refresh_files()
 
     def on_file_selection_changed(self):
+        self.current_view = None
         selected_items = self.file_list.selectedItems()
         if len(selected_items) == 1:
             self.on_file_select(selected_items[0])
@@ -664,10 +2653,14 @@ class ReplayAnalyzer(QMainWindow):
     def on_file_select(self, item):
         file_name = item.text()
         file_path = os.path.join(self.current_folder, file_name)
-        result = process_file(file_path, self.cache_dir)
-        if result:
-            self.all_game_data[file_name] = result
-            self.display_results(file_name)
+        result = self.result_cache.get(file_path)
+        if result is None:
+            result = process_file(file_path, self.cache_dir)
+            # Failed parses are not kept so a retry from the quarantine dialog is picked up
+            if result[1]:
+                self.result_cache.put(file_path, result)
+        if result[1]:
+            self.display_results(file_name, result)
         else:
             QMessageBox.warning(self, "Error", f"Failed to process file: {file_name}")
 
@@ -685,27 +2678,43 @@ class ReplayAnalyzer(QMainWindow):
     def filter_players(self):
         filter_text = self.player_filter.text().lower()
         if self.current_file:
-            data = self.all_game_data[self.current_file]
+            data = self.current_data
             if len(data) == 3:
                 round_stats, overall_stats, winner = data
             else:
                 round_stats, overall_stats = data
                 winner = None
 
-            filtered_stats = {player: stats for player, stats in overall_stats.items() if filter_text in player.lower()}
+            current_round = self.round_selector.currentIndex()
+            if current_round < len(round_stats):
+                filtered_stats = {player: stats for player, stats in round_stats[current_round].items() if filter_text in player.lower()}
+                winner = max(filtered_stats, key=lambda x: filtered_stats[x]['VS Score']) if filtered_stats else None
+            else:
+                filtered_stats = {player: stats for player, stats in overall_stats.items() if filter_text in player.lower()}
+
             self.update_stats_display(filtered_stats, winner)
             self.update_graphs(filtered_stats)
 
-            current_round = self.round_selector.currentIndex()
-            if current_round < len(round_stats):
-                filtered_round_stats = {player: stats for player, stats in round_stats[current_round].items() if filter_text in player.lower()}
-                round_winner = max(filtered_round_stats, key=lambda x: filtered_round_stats[x]['VS Score']) if filtered_round_stats else None
-                self.update_stats_display(filtered_round_stats, round_winner)
-                self.update_graphs(filtered_round_stats)
+    def search_library_players(self):
+        matches = self.player_index.search(self.player_filter.text())
+        self.player_results.clear()
+        self.player_results.addItems(matches)
+        self.player_results.setVisible(bool(matches))
 
-    def display_results(self, file_name):
+    def show_library_profile(self, player):
+        profile = self.library_profiles.get(player)
+        if profile is None:
+            return
+        stats = {player: profile.get_averages()}
+        self.clear_player_profiles()
+        self.player_profiles = {player: profile}
+        self.update_stats_display(stats)
+        self.update_graphs(stats)
+        self.update_player_profiles_display()
+
+    def display_results(self, file_name, data):
         self.current_file = file_name
-        data = self.all_game_data[file_name]
+        self.current_data = data
         if len(data) == 3:
             round_stats, overall_stats, winner = data
         else:
@@ -733,6 +2742,12 @@ class ReplayAnalyzer(QMainWindow):
             tab = QWidget()
             layout = QVBoxLayout(tab)
 
+            rating = self.ratings.get_rating(player)
+            if rating is not None:
+                rating_label = QLabel(f"Rating: {rating['rating']:.0f} ({rating['games']} rated games)")
+                rating_label.setFont(large_font)
+                layout.addWidget(rating_label)
+
             style = self.analyze_play_style(profile)
             style_label = QLabel(f"Play Style: {style}")
             style_label.setFont(large_font)
@@ -748,184 +2763,20 @@ class ReplayAnalyzer(QMainWindow):
                 suggestion_label.setWordWrap(True)
                 layout.addWidget(suggestion_label)
 
+            similar_button = QPushButton("Similar Players")
+            similar_button.clicked.connect(partial(self.show_similar_players, player))
+            layout.addWidget(similar_button)
+
             self.profile_tabs.addTab(tab, player)
 
         self.profile_tabs.setMaximumHeight(400)
         self.profile_tabs.setMinimumHeight(150)
 
     def analyze_play_style(self, player_profile):
-        averages = player_profile.get_averages()
-        app = averages['APP']
-        vs_apm_ratio = averages['VS Score'] / averages['APM'] if averages['APM'] > 0 else 0
-        ge = averages['Garbage Efficiency']
-        pps = averages['PPS']
-
-        app_thresholds = [0.3, 0.45, 0.6, 0.75, 0.9]
-        ge_thresholds = [0.05, 0.10, 0.15, 0.20, 0.30]
-        vs_apm_thresholds = [1.6, 1.9, 2.0, 2.2, 2.5]
-        pps_thresholds = [1.0, 2.0, 2.5, 3.0, 4]
-        
-        def categorize(value, thresholds):
-            categories = ["Low", "Below Average", "Average", "Above Average", "High", "Extremely High", "God-Tier"]
-            for i, threshold in enumerate(thresholds):
-                if value < threshold:
-                    return categories[i]
-            return categories[-1]
-
-        app_category = categorize(app, app_thresholds)
-        ge_category = categorize(ge, ge_thresholds)
-        vs_apm_category = categorize(vs_apm_ratio, vs_apm_thresholds)
-        pps_category = categorize(pps, pps_thresholds)
-
-        speed_descriptors = {
-            "Low": "Very low-speed",
-            "Below Average": "Low-speed",
-            "Average": "Medium-speed",
-            "Above Average": "High-speed",
-            "High": "Very high-speed",
-            "Extremely High": "Extremely high-speed",
-            "God-Tier": "God Tier-speed"
-        }
-        speed_descriptor = speed_descriptors[pps_category]
-
-        if app_category in ["God-Tier", "Extremely High"]:
-            attack_style = "Highly efficient attacker"
-        elif app_category in ["High", "Above Average"]:
-            attack_style = "Efficient attacker"
-        elif app_category == "Average":
-            attack_style = "Balanced attacker"
-        else:
-            attack_style = "Inefficient attacker"
-
-        if vs_apm_category in ["Low", "Below Average"]:
-            if pps_category in ["High", "Extremely High", "God-Tier"]:
-                aggressiveness = "Highly offensive"
-            elif pps_category in ["Above Average", "Average"]:
-                aggressiveness = "Offensive"
-            else:
-                aggressiveness = "Low-pressure player"
-        elif vs_apm_category in ["Average", "Above Average"]:
-            aggressiveness = "Balanced"
-        else:
-            if ge_category in ["High", "Extremely High", "God-Tier"]:
-                aggressiveness = "Defensive specialist"
-            elif ge_category in ["Above Average", "Average"]:
-                aggressiveness = "Pressure-resistant"
-            else:
-                aggressiveness = "Defensive struggler"
-
-        if vs_apm_category in ["God-Tier", "Extremely High", "High"]:
-            if ge_category in ["God-Tier", "Extremely High", "High"]:
-                garbage_style = "Exceptional garbage handler under extreme pressure"
-            elif ge_category in ["Above Average", "Average"]:
-                garbage_style = "Competent garbage handler under high pressure"
-            else:
-                garbage_style = "Struggles with efficiency under high pressure"
-        elif vs_apm_category in ["Above Average", "Average"]:
-            if ge_category in ["God-Tier", "Extremely High", "High"]:
-                garbage_style = "Highly efficient garbage handler under moderate pressure"
-            elif ge_category in ["Above Average", "Average"]:
-                garbage_style = "Balanced garbage handling under moderate pressure"
-            else:
-                garbage_style = "Inefficient garbage handler under moderate pressure"
-        else:
-            if ge_category in ["God-Tier", "Extremely High", "High"]:
-                garbage_style = "Highly efficient garbage handler with low incoming pressure"
-            elif ge_category in ["Above Average", "Average"]:
-                garbage_style = "Competent garbage handler with low incoming pressure"
-            else:
-                garbage_style = "Inefficient garbage handling, even under low pressure"
-
-        playstyle = f"{speed_descriptor}, {aggressiveness} player with {attack_style.lower()} capabilities. {garbage_style}."
-
-        if vs_apm_category in ["God-Tier", "Extremely High", "High"] and app_category in ["God-Tier", "Extremely High", "High"]:
-            playstyle += " Excels in high-pressure situations with efficient counterattacks."
-        elif vs_apm_category in ["Low", "Below Average"] and pps_category in ["High", "Extremely High", "God-Tier"]:
-            playstyle += " Dominates through relentless offensive pressure."
-        elif vs_apm_category in ["God-Tier", "Extremely High", "High"] and ge_category in ["God-Tier", "Extremely High", "High"]:
-            playstyle += " Thrives on efficient downstacking under extreme pressure."
-        elif vs_apm_category in ["Low", "Below Average"] and app_category in ["High", "Extremely High", "God-Tier"]:
-            playstyle += " Efficiently converts opportunities into strong attacks."
-
-        return playstyle
+        return analyze_play_style(player_profile)
 
     def get_improvement_suggestions(self, player_profile):
-        averages = player_profile.get_averages()
-        app = averages['APP']
-        vs_apm_ratio = averages['VS Score'] / averages['APM'] if averages['APM'] > 0 else 0
-        ge = averages['Garbage Efficiency']
-        pps = averages['PPS']
-
-        app_thresholds = [0.3, 0.45, 0.6, 0.75, 0.9]
-        ge_thresholds = [0.05, 0.10, 0.15, 0.20, 0.30]
-        vs_apm_thresholds = [1.6, 1.9, 2.0, 2.2, 2.5]
-        pps_thresholds = [1.0, 2.0, 2.5, 3.0, 4]
-
-        def categorize(value, thresholds):
-            categories = ["Low", "Below Average", "Average", "Above Average", "High", "Extremely High", "God-Tier"]
-            for i, threshold in enumerate(thresholds):
-                if value < threshold:
-                    return categories[i]
-            return categories[-1]
-
-        app_category = categorize(app, app_thresholds)
-        ge_category = categorize(ge, ge_thresholds)
-        vs_apm_category = categorize(vs_apm_ratio, vs_apm_thresholds)
-        pps_category = categorize(pps, pps_thresholds)
-
-        suggestions = []
-
-        if pps_category == "God-Tier":
-            suggestions.append("Your speed is phenomenal. Focus on maintaining this level while optimizing efficiency, attack power, and consistency under varying pressure situations.")
-        elif pps_category in ["Extremely High", "High"]:
-            suggestions.append("Your speed is excellent. Work on consistency and efficiency at these high speeds.")
-        elif pps_category in ["Above Average", "Average"]:
-            suggestions.append("Your speed is good. Continue to improve by practicing finesse and efficient piece placement.")
-        else:
-            suggestions.append("Focus on increasing your overall speed (PPS). Practice finesse and efficient piece placement.")
-
-        if ge_category == "God-Tier":
-            suggestions.append("Your garbage efficiency is outstanding. Maintain this level while optimizing other aspects of your game.")
-        elif ge_category in ["Extremely High", "High"]:
-            suggestions.append("Your garbage efficiency is very good. Fine-tune your downstacking for even better performance under pressure.")
-        elif ge_category in ["Above Average", "Average"]:
-            suggestions.append("Your garbage efficiency is decent. Practice more efficient downstacking techniques to improve further.")
-        else:
-            suggestions.append("Work on improving your garbage efficiency. Focus on cleaner downstacking and better piece placement.")
-
-        if app_category == "God-Tier":
-            suggestions.append("Your attack efficiency is incredible. Focus on maintaining this level while adapting to different board states and opponent playstyles.")
-        elif app_category in ["Extremely High", "High"]:
-            suggestions.append("Your attack efficiency is very good. Work on consistency and adapting to different situations.")
-        elif app_category in ["Above Average", "Average"]:
-            suggestions.append("Your attack efficiency is solid. Practice more advanced attack techniques to increase your APP.")
-        else:
-            suggestions.append("Improve your attack efficiency (APP). Practice building cleaner and executing attacks faster.")
-
-        if vs_apm_category in ["High", "Extremely High", "God-Tier"] and app_category in ["High", "Extremely High", "God-Tier"]:
-            suggestions.append("You're effectively attacking while handling high pressure. Focus on maintaining this balance and look for opportunities to overwhelm opponents.")
-        elif vs_apm_category in ["High", "Extremely High", "God-Tier"] and app_category in ["Low", "Below Average", "Average"]:
-            suggestions.append("You're handling high pressure but could improve your attack efficiency. Work on building and executing attacks more effectively under pressure.")
-        elif vs_apm_category in ["Low", "Below Average", "Average"] and app_category in ["High", "Extremely High", "God-Tier"]:
-            suggestions.append("Your attacks are highly efficient, but you're not under much pressure. Practice maintaining this efficiency against stronger opponents or in faster-paced games.")
-        elif vs_apm_category in ["Low", "Below Average", "Average"] and app_category in ["Low", "Below Average", "Average"]:
-            suggestions.append("You're not under much pressure, but your attacks could be more efficient. Focus on improving your offensive capabilities to control the game better.")
-
-        if vs_apm_category in ["High", "Extremely High", "God-Tier"] and ge_category in ["High", "Extremely High", "God-Tier"]:
-            suggestions.append("You're excellently managing high amounts of garbage. Work on offensive strategies to reduce incoming attacks while maintaining this efficiency.")
-        elif vs_apm_category in ["High", "Extremely High", "God-Tier"] and ge_category in ["Low", "Below Average", "Average"]:
-            suggestions.append("You're under high pressure and could improve your garbage management. Focus on more efficient downstacking techniques.")
-        elif vs_apm_category in ["Low", "Below Average", "Average"] and ge_category in ["High", "Extremely High", "God-Tier"]:
-            suggestions.append("Your garbage efficiency is high, but you're not under much pressure. Prepare for handling higher pressure situations while maintaining this efficiency.")
-        elif vs_apm_category in ["Low", "Below Average", "Average"] and ge_category in ["Low", "Below Average", "Average"]:
-            suggestions.append("You're not under much pressure, but could improve garbage efficiency. Work on downstacking techniques to prepare for higher-pressure games.")
-
-        if pps_category in ["High", "Extremely High", "God-Tier"] and app_category in ["Low", "Below Average"]:
-            suggestions.append("Your speed is excellent, but your attack efficiency could improve. Focus on converting your quick placements into more effective attacks.")
-        elif app_category in ["High", "Extremely High", "God-Tier"] and pps_category in ["Low", "Below Average"]:
-            suggestions.append("Your attack efficiency is high, but overall speed is low. Work on increasing PPS while maintaining strong attack patterns.")
-
-        return suggestions[:5]
+        return get_improvement_suggestions(player_profile)
 
     def update_stats_display(self, stats, winner=None):
         self.player_stats_widget.update_stats(stats, winner)
@@ -938,7 +2789,7 @@ class ReplayAnalyzer(QMainWindow):
 
     def on_round_select(self, index):
         if self.current_file:
-            data = self.all_game_data[self.current_file]
+            data = self.current_data
             if len(data) == 3:
                 round_stats, overall_stats, winner = data
             else:
@@ -969,20 +2820,22 @@ class ReplayAnalyzer(QMainWindow):
         overall_winner = None
         total_wins = {}
 
-        for i, batch_results in enumerate(batch_process_files(file_paths, self.cache_dir)):
-            for result in batch_results:
-                if result:
-                    round_stats, overall_stats, winner = result
-                    for player, stats in overall_stats.items():
-                        if player not in combined_stats:
-                            combined_stats[player] = {stat: [] for stat in stats}
-                            total_wins[player] = 0
-                        for stat, value in stats.items():
-                            combined_stats[player][stat].append(value)
-                        if player == winner:
-                            total_wins[player] += 1
-            
-            progress.setValue(i * 10)  # Assuming batch size of 10
+        seen_replays = set()
+        for i, (file_path, entry) in enumerate(stream_process_files(file_paths, self.cache_dir), 1):
+            # Each replay counts once no matter how many copies are selected
+            if entry is not None and entry['replay_id'] not in seen_replays:
+                seen_replays.add(entry['replay_id'])
+                round_stats, overall_stats, winner = entry['result']
+                for player, stats in overall_stats.items():
+                    if player not in combined_stats:
+                        combined_stats[player] = {stat: [] for stat in stats}
+                        total_wins[player] = 0
+                    for stat, value in stats.items():
+                        combined_stats[player][stat].append(value)
+                    if player == winner:
+                        total_wins[player] += 1
+
+            progress.setValue(i)
             if progress.wasCanceled():
                 break
             
@@ -995,6 +2848,10 @@ class ReplayAnalyzer(QMainWindow):
 
         progress.setValue(len(file_paths))
 
+        self.show_combined_stats(combined_stats, overall_winner)
+
+    def show_combined_stats(self, combined_stats, overall_winner):
+        self.current_view = {'stats': combined_stats, 'winner': overall_winner}
         self.update_stats_display(combined_stats, overall_winner)
         self.update_graphs(combined_stats)
         self.update_player_profiles(combined_stats)
@@ -1003,25 +2860,119 @@ class ReplayAnalyzer(QMainWindow):
     def reprocess_all_files(self):
         if not self.current_folder:
             return
+        if self.scan_thread is not None:
+            self.scan_thread.stop()
+
+        self.rebuild_progress = QProgressDialog("Rebuilding library...", "Cancel", 0, 0, self)
+        self.rebuild_progress.setWindowModality(Qt.WindowModal)
+        self.rebuild_thread = RebuildThread(self.current_folder, self.cache_dir, self)
+        self.rebuild_thread.progress.connect(self.on_rebuild_progress)
+        self.rebuild_thread.finished.connect(self.on_rebuild_finished)
+        self.rebuild_progress.canceled.connect(self.rebuild_thread.stop)
+        self.rebuild_thread.start()
+
+    def on_rebuild_progress(self, completed, total):
+        self.rebuild_progress.setMaximum(total)
+        self.rebuild_progress.setValue(completed)
+
+    def on_rebuild_finished(self):
+        thread = self.rebuild_thread
+        self.rebuild_progress.canceled.disconnect(thread.stop)
+        self.rebuild_progress.close()
+        self.result_cache.clear()
+        if thread.stopped:
+            QMessageBox.information(self, "Rebuild Paused",
+                                    f"Rebuilt {thread.completed} files. Rebuild again to resume where it stopped.")
+        else:
+            # Rollups were built from the old entries so they are recomputed by a fresh scan
+            self.trends.clear()
+            self.similarity = SimilarityIndex()
+            self.library_profiles = {}
+            self.library_replay_ids = set()
+            QMessageBox.information(self, "Rebuild Complete",
+                                    f"Checked {thread.completed} files, {thread.failed} failed to parse.")
+        self.refresh_files()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetr.io Replay Analyzer")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--memory-budget', type=int, default=64, help="Megabytes of parsed replays kept in memory")
+    subparsers = parser.add_subparsers(dest='command')
+
+    export_parser = subparsers.add_parser('export', help="Export analyzed replays to a columnar file")
+    export_parser.add_argument('folder')
+    export_parser.add_argument('--out', default="export")
+    export_parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    export_parser.add_argument('--batch-size', type=int, default=50000)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve the analyzed library over a local read-only HTTP API")
+    serve_parser.add_argument('folder')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--cache-size', type=int, default=256)
+
+    rebuild_parser = subparsers.add_parser('rebuild', help="Reprocess every replay whose cache entry is stale")
+    rebuild_parser.add_argument('folder')
+    rebuild_parser.add_argument('--workers', type=int, default=None)
+
+    shard_parser = subparsers.add_parser('shard', help="Process shard INDEX of COUNT of a replay folder or manifest")
+    shard_parser.add_argument('folder', nargs='?')
+    shard_parser.add_argument('--manifest', help="Text file listing one replay path per line")
+    shard_parser.add_argument('--index', type=int, required=True)
+    shard_parser.add_argument('--count', type=int, required=True)
+    shard_parser.add_argument('--out', required=True)
+    shard_parser.add_argument('--workers', type=int, default=None)
+
+    merge_parser = subparsers.add_parser('merge', help="Merge finished shards into one library")
+    merge_parser.add_argument('out')
+
+    render_parser = subparsers.add_parser('render', help="Render radar chart cards to PNG without opening the app")
+    render_parser.add_argument('folder')
+    render_parser.add_argument('--by', choices=['player', 'match'], default='player')
+    render_parser.add_argument('--out', default="cards")
+    render_parser.add_argument('--width', type=int, default=1200)
+    render_parser.add_argument('--height', type=int, default=650)
+    render_parser.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        row_count = export_library(args.folder, args.cache_dir, args.out, args.format, args.batch_size)
+        print(f"Exported {row_count} rows to {args.out}")
+        return 0
+    if args.command == 'rebuild':
+        completed, failed = rebuild_library(args.folder, args.cache_dir, args.workers)
+        print(f"Checked {completed} files, {failed} failed to parse")
+        return 0
+    if args.command == 'shard':
+        if args.manifest:
+            with open(args.manifest, 'r') as f:
+                file_paths = [line.strip() for line in f if line.strip()]
+        elif args.folder:
+            file_paths = [os.path.join(args.folder, file_name) for file_name in list_replay_files(args.folder)]
+        else:
+            parser.error("shard needs a folder or --manifest")
+        if not 0 <= args.index < args.count:
+            parser.error("--index must be between 0 and --count - 1")
+        shard_result = process_shard(file_paths, args.index, args.count, args.out, args.workers)
+        print(f"Shard {args.index} of {args.count}: {len(shard_result['files'])} files, {len(shard_result['failed'])} failed")
+        return 0
+    if args.command == 'merge':
+        library = merge_shards(args.out, args.cache_dir)
+        print(f"Merged {library['shards']} shards: {len(library['replays'])} replays, {len(library['players'])} players")
+        return 0
+    if args.command == 'render':
+        count = render_library_cards(args.folder, args.cache_dir, args.out, args.by, args.width, args.height, args.workers)
+        print(f"Rendered {count} cards to {args.out}")
+        return 0
+    if args.command == 'serve':
+        serve_library(args.folder, args.cache_dir, args.host, args.port, args.cache_size)
+        return 0
 
-        progress = QProgressDialog("Reprocessing all files...", "Cancel", 0, len(self.all_game_data), self)
-        progress.setWindowModality(Qt.WindowModal)
-
-        for i, file_name in enumerate(self.all_game_data.keys()):
-            file_path = os.path.join(self.current_folder, file_name)
-            result = process_file(file_path, self.cache_dir)
-            if result:
-                self.all_game_data[file_name] = result
-
-            progress.setValue(i)
-            if progress.wasCanceled():
-                break
-
-        progress.setValue(len(self.all_game_data))
-        QMessageBox.information(self, "Reprocessing Complete", "All files have been reprocessed with the new format.")
+    app = QApplication(sys.argv[:1])
+    window = ReplayAnalyzer(args.memory_budget * 1024 * 1024, args.cache_dir)
+    window.show()
+    return app.exec_()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ReplayAnalyzer()
-    window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TetrisStats
+
+
+def write_replay(path, events):
+    rounds = [[{'username': username, 'stats': {'pps': 2.0, 'apm': 60.0, 'vsscore': 120.0}, 'events': events}
+               for username in ('alice', 'bob')]]
+    data = {'_id': "rid0", 'ts': "2024-01-01T12:00:00.000Z",
+            'replay': {'leaderboard': [{'username': 'alice', 'wins': 3}, {'username': 'bob', 'wins': 1}], 'rounds': rounds}}
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+EVENTS = [
+    {'type': 'keydown', 'data': None},
+    {'type': 'keydown', 'data': {'key': 'moveLeft'}},
+    {'type': 'keydown', 'data': {'key': 'hardDrop'}},
+    {'type': 'end', 'data': {'export': {'stats': {'topcombo': 4, 'lines': 10, 'garbage': {'sent': 5}}}}}
+]
+
+
+def test_events_without_data_are_fed(tmp_path):
+    replay = tmp_path / "r0.ttrm"
+    write_replay(str(replay), EVENTS)
+
+    entry = TetrisStats.process_replay(str(replay), str(tmp_path / "cache"))
+
+    assert entry is not None
+    assert entry['metrics']['KPP']['overall'] == {'alice': 3.0, 'bob': 3.0}
+    assert entry['metrics']['Top Combo']['overall'] == {'alice': 4, 'bob': 4}
+
+
+def test_failing_reducer_only_loses_its_metric(tmp_path, monkeypatch):
+    class BrokenReducer(TetrisStats.MetricReducer):
+        name = 'Broken'
+
+        def feed(self, event):
+            raise ValueError("bad event")
+
+    monkeypatch.setitem(TetrisStats.METRIC_REDUCERS, 'Broken', BrokenReducer)
+    replay = tmp_path / "r0.ttrm"
+    write_replay(str(replay), EVENTS)
+    cache_dir = str(tmp_path / "cache")
+
+    entry = TetrisStats.process_replay(str(replay), cache_dir)
+
+    assert entry is not None
+    assert entry['result'][2] == 'alice'
+    assert entry['metrics']['Broken']['error'] == "ValueError: bad event"
+    assert entry['metrics']['Broken']['version'] == BrokenReducer.version
+    assert entry['metrics']['Attack/Line']['overall'] == {'alice': 0.5, 'bob': 0.5}
+    assert TetrisStats.load_failure(str(replay), cache_dir) is None
+    # The failed metric is recorded at its version, so the cached entry is served as is
+    assert TetrisStats.stale_metrics(entry) == []
@@ -0,0 +1,87 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TetrisStats
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TetrisStats.py")
+
+
+def write_replays(folder, count):
+    rng = random.Random(7)
+    names = [f"player{i}" for i in range(12)]
+    for k in range(count):
+        a, b = rng.sample(names, 2)
+        rounds = [[{'username': username, 'stats': {'pps': rng.uniform(1, 3.5), 'apm': rng.uniform(30, 180),
+                                                    'vsscore': rng.uniform(60, 350)}} for username in (a, b)]
+                  for _ in range(rng.randint(2, 4))]
+        data = {'_id': f"rid{k}", 'ts': f"2024-01-{1 + k % 28:02d}T12:00:00.000Z",
+                'replay': {'leaderboard': [{'username': a, 'wins': 3}, {'username': b, 'wins': rng.randint(0, 2)}],
+                           'rounds': rounds}}
+        with open(os.path.join(folder, f"r{k}.ttrm"), 'w') as f:
+            json.dump(data, f)
+    # Copies of one replay under other names and a file that fails to parse
+    for copy in range(3):
+        shutil.copy(os.path.join(folder, "r0.ttrm"), os.path.join(folder, f"copy{copy}_r0.ttrm"))
+    with open(os.path.join(folder, "broken.ttrm"), 'w') as f:
+        f.write("{not json")
+
+
+@pytest.mark.parametrize('shard_count', [1, 3, 4])
+def test_merged_shards_match_single_pass(tmp_path, shard_count):
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    write_replays(str(folder), 60)
+    out_dir = tmp_path / "shards"
+
+    # Every shard runs in its own process, as it would on a separate node
+    processes = [subprocess.Popen([sys.executable, SCRIPT, 'shard', str(folder), '--index', str(index),
+                                   '--count', str(shard_count), '--out', str(out_dir), '--workers', '1'],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for index in range(shard_count)]
+    assert [process.wait(timeout=120) for process in processes] == [0] * shard_count
+
+    library = TetrisStats.merge_shards(str(out_dir), str(tmp_path / "merged_cache"))
+
+    players = {}
+    replays = {}
+    failed = []
+    file_paths = [os.path.join(str(folder), file_name) for file_name in TetrisStats.list_replay_files(str(folder))]
+    for file_path in file_paths:
+        entry = TetrisStats.process_replay(file_path, str(tmp_path / "single_cache"))
+        if entry is None:
+            failed.append(os.path.basename(file_path))
+        elif entry['replay_id'] not in replays:
+            replays[entry['replay_id']] = os.path.basename(file_path)
+            TetrisStats.accumulate_replay(players, entry['result'])
+
+    assert sorted(library['files']) == sorted(os.path.basename(file_path) for file_path in file_paths)
+    assert sorted(library['failed']) == sorted(failed)
+    assert set(library['replays']) == set(replays)
+    assert set(library['players']) == set(players)
+    for player, summary in players.items():
+        merged = library['players'][player]
+        assert merged['games'] == summary['games']
+        assert merged['wins'] == summary['wins']
+        assert merged['matchups'] == summary['matchups']
+        assert merged['bests'] == summary['bests']
+        for stat in TetrisStats.STAT_RANGES:
+            assert merged['sums'][stat] == pytest.approx(summary['sums'][stat])
+
+
+def test_merge_refuses_missing_shards(tmp_path):
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    write_replays(str(folder), 10)
+    file_paths = [os.path.join(str(folder), file_name) for file_name in TetrisStats.list_replay_files(str(folder))]
+    TetrisStats.process_shard(file_paths, 0, 2, str(tmp_path / "shards"), max_workers=1)
+
+    with pytest.raises(ValueError):
+        TetrisStats.merge_shards(str(tmp_path / "shards"), str(tmp_path / "merged_cache"))
@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TetrisStats
+from test_shards import write_replays
+
+
+def run_stream(file_paths, cache_dir):
+    # The stream runs on a thread so a hang fails the test instead of the whole run
+    outcome = {}
+
+    def consume():
+        try:
+            outcome['results'] = dict(TetrisStats.stream_process_files(file_paths, cache_dir, max_workers=2))
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "stream_process_files did not finish"
+    return outcome
+
+
+def test_unreadable_cache_entry_does_not_stall_the_stream(tmp_path):
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    write_replays(str(folder), 10)
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "r2.ttrm.cache").mkdir()
+    file_paths = [os.path.join(str(folder), file_name) for file_name in TetrisStats.list_replay_files(str(folder))]
+
+    outcome = run_stream(file_paths, str(cache_dir))
+
+    assert set(outcome['results']) == set(file_paths)
+    assert outcome['results'][os.path.join(str(folder), "r2.ttrm")] is None
+    assert outcome['results'][os.path.join(str(folder), "r3.ttrm")] is not None
+
+
+def test_reader_errors_reach_the_consumer(tmp_path, monkeypatch):
+    folder = tmp_path / "replays"
+    folder.mkdir()
+    write_replays(str(folder), 10)
+    file_paths = [os.path.join(str(folder), file_name) for file_name in TetrisStats.list_replay_files(str(folder))]
+
+    def broken_needs_parse(file_path, cache_dir):
+        raise RuntimeError("reader failed")
+
+    monkeypatch.setattr(TetrisStats, 'needs_parse', broken_needs_parse)
+    outcome = run_stream(file_paths, str(tmp_path / "cache"))
+
+    assert isinstance(outcome['error'], RuntimeError)